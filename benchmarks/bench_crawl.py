@@ -0,0 +1,105 @@
+"""
+端到端爬取基准
+启动本地模拟接口，对每种存储类型在独立子进程中运行run_crawler，
+报告 页/秒、评论/秒 和子进程的峰值内存(RSS)
+子进程在临时目录中运行，产生的data/目录在结束后删除
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.bench_crawl
+    python -m benchmarks.bench_crawl --pages 500 --latency 0.02 --error-rate 0.01 --reply-workers 8
+    python -m benchmarks.bench_crawl --stores csv sqlite database   # database需要MySQL环境变量
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_server import start_server
+
+
+STORES = ["csv", "json", "jsonl", "sqlite", "parquet"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(args):
+    """
+    子进程：爬取一个视频并输出一行json结果
+    """
+    from run_crawler import run_crawler
+
+    start = time.perf_counter()
+    pages = run_crawler(f"bench-{args.store}", store_type=args.store, queue_size=args.queue_size,
+                        reply_workers=args.reply_workers, reply_rate=args.reply_rate,
+                        resume=False, archive=args.archive)
+    seconds = time.perf_counter() - start
+    # Linux下ru_maxrss的单位是KB
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"pages": pages, "comments": pages * args.page_size,
+                      "seconds": seconds, "peak_rss_mb": peak_rss}))
+
+
+def run_store(args, store: str, url: str) -> dict:
+    """
+    在临时目录中启动子进程测量一种存储类型
+    """
+    command = [sys.executable, "-m", "benchmarks.bench_crawl", "--worker", "--store", store,
+               "--page-size", str(args.page_size), "--queue-size", str(args.queue_size),
+               "--reply-workers", str(args.reply_workers), "--reply-rate", str(args.reply_rate)]
+    if args.archive:
+        command += ["--archive", args.archive]
+    env = dict(os.environ, DOUYIN_API_HOST=url,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = subprocess.run(command, cwd=work_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程异常退出")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端爬取基准")
+    parser.add_argument("--stores", nargs="+", default=STORES, help="要测量的存储类型")
+    parser.add_argument("--pages", type=int, default=200, help="评论页数")
+    parser.add_argument("--page-size", type=int, default=20, help="每页评论数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟接口平均延迟(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟接口返回503的概率")
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--reply-workers", type=int, default=0)
+    parser.add_argument("--reply-rate", type=float, default=1000.0)
+    parser.add_argument("--archive", default=None, help="同时写入原始页面归档(gzip/zstd)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    server = start_server(pages=args.pages, page_size=args.page_size,
+                          latency=args.latency, error_rate=args.error_rate)
+    print(f"模拟接口 {server.url}：{args.pages}页 x {args.page_size}条，"
+          f"延迟{args.latency}s，错误率{args.error_rate:.0%}")
+    print(f"{'存储类型':<10}{'页/秒':>10}{'评论/秒':>12}{'耗时(s)':>10}{'峰值RSS(MB)':>14}")
+    try:
+        for store in args.stores:
+            try:
+                result = run_store(args, store, server.url)
+            except RuntimeError as e:
+                print(f"{store:<12}失败: {e}")
+                continue
+            print(f"{store:<12}{result['pages'] / result['seconds']:>10,.1f}"
+                  f"{result['comments'] / result['seconds']:>14,.0f}"
+                  f"{result['seconds']:>10.2f}{result['peak_rss_mb']:>14.1f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(f"模拟接口共处理{server.requests}个请求，其中{server.errors}个返回错误")
+
+
+if __name__ == "__main__":
+    main()
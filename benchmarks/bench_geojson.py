@@ -0,0 +1,53 @@
+"""
+省份地图GeoJSON简化基准
+对config.GEOJSON_TOLERANCES中的每个容差，统计：
+1. 坐标点数和GeoJSON大小
+2. 简化耗时(每个进程只发生一次)
+3. create_local_figure生成图表并序列化为JSON(即发送给浏览器的内容)的耗时和大小
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.bench_geojson
+    python -m benchmarks.bench_geojson --path china.json --tolerances 0 0.01 0.05
+"""
+
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from utility import geojson_loader
+from utility.config import config
+from view import create_local_figure
+
+
+def main():
+    parser = argparse.ArgumentParser(description="省份地图GeoJSON简化基准")
+    parser.add_argument("--path", default="", help="省级GeoJSON文件，默认按geojson_loader的规则读取")
+    parser.add_argument("--tolerances", nargs="+", type=float, default=list(config.GEOJSON_TOLERANCES))
+    args = parser.parse_args()
+
+    if args.path:
+        config.GEOJSON_PATH = args.path
+    raw = geojson_loader.load_raw_geojson()
+    names = [feature['properties']['name'] for feature in raw['features']]
+    # 每个省份随意的评论数，只用于生成图表
+    df = pd.DataFrame({'省份': names, '评论数量': [(i * 37) % 100 for i in range(len(names))]})
+
+    print(f"共{len(names)}个要素")
+    print(f"{'容差':>8}{'点数':>10}{'GeoJSON(KB)':>14}{'简化(ms)':>10}{'图表JSON(KB)':>14}{'生成+序列化(ms)':>18}")
+    for tolerance in args.tolerances:
+        start = time.perf_counter()
+        geojson = geojson_loader.load_geojson(tolerance)
+        simplify_ms = (time.perf_counter() - start) * 1000
+        # 简化结果已缓存，这里只计图表的生成和序列化
+        start = time.perf_counter()
+        figure_json = create_local_figure(df, tolerance).to_json()
+        figure_ms = (time.perf_counter() - start) * 1000
+        print(f"{tolerance:>8}{geojson_loader.count_points(geojson):>10}"
+              f"{len(json.dumps(geojson, ensure_ascii=False).encode('utf-8')) / 1024:>14.1f}{simplify_ms:>10.0f}"
+              f"{len(figure_json.encode('utf-8')) / 1024:>14.1f}{figure_ms:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
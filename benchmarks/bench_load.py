@@ -0,0 +1,121 @@
+"""
+评论数据载入基准
+对同一个csv文件，分别用普通模式(C引擎、类型推断)和快速模式(pyarrow引擎、指定类型)运行load_data，
+每种模式在独立子进程中运行，报告 载入耗时、峰值内存(RSS)和DataFrame占用的内存
+没有指定csv时生成一个合成的评论csv(列与CsvStore一致)
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.bench_load                        # 合成100万条评论
+    python -m benchmarks.bench_load --rows 3000000
+    python -m benchmarks.bench_load --csv data/csv/xxx.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic import PROVINCES, sample_texts
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"普通": False, "快速": True}
+
+
+def make_csv(file_name: str, rows: int):
+    """
+    生成合成评论csv
+    """
+    from store import CsvStore
+
+    rng = random.Random(0)
+    texts = sample_texts()
+    users = [f"用户{i}" for i in range(max(1, rows // 5))]
+    start = datetime(2024, 11, 1)
+    with open(file_name, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(CsvStore.headers)
+        for i in range(rows):
+            emotion = rng.choice(["积极", "消极", None])
+            writer.writerow([
+                7400000000000000000 + i,
+                rng.choice(users),
+                (start + timedelta(seconds=rng.randint(0, 30 * 86400))).strftime("%Y-%m-%d %H:%M:%S"),
+                rng.choice(PROVINCES),
+                rng.choice(texts),
+                int(rng.paretovariate(1.2)) - 1,
+                rng.choice([0, 0, 0, 1, 2, 5]),
+                emotion,
+                None if emotion is None else round(rng.uniform(0.5, 1.0), 4),
+            ])
+
+
+def worker(args):
+    """
+    子进程：载入一次并输出一行json结果
+    """
+    from utility.data_loader import load_data
+
+    # Linux下ru_maxrss的单位是KB
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    df = load_data(args.csv, fast=args.fast)
+    seconds = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"rows": len(df), "seconds": seconds, "base_rss_mb": base_rss, "peak_rss_mb": peak_rss,
+                      "df_mb": df.memory_usage(deep=True).sum() / 1024 / 1024}))
+
+
+def run_mode(csv_path: str, fast: bool) -> dict:
+    """
+    在子进程中测量一种载入模式
+    """
+    command = [sys.executable, "-m", "benchmarks.bench_load", "--worker", "--csv", csv_path]
+    if fast:
+        command.append("--fast")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程异常退出")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评论数据载入基准")
+    parser.add_argument("--csv", default="", help="评论csv文件，默认生成合成数据")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="合成数据的评论数")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fast", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.abspath(args.csv) if args.csv else os.path.join(work_dir, "bench.csv")
+        if not args.csv:
+            start = time.perf_counter()
+            make_csv(csv_path, args.rows)
+            print(f"已生成{args.rows:,}条合成评论({time.perf_counter() - start:.1f}s)")
+        print(f"{csv_path}: {os.path.getsize(csv_path) / 1024 / 1024:.1f} MB")
+        print(f"{'模式':<8}{'行数':>12}{'耗时(s)':>10}{'导入后RSS(MB)':>16}{'峰值RSS(MB)':>14}{'DataFrame(MB)':>16}")
+        for name, fast in MODES.items():
+            try:
+                result = run_mode(csv_path, fast)
+            except RuntimeError as e:
+                print(f"{name:<8}失败: {e}")
+                continue
+            print(f"{name:<8}{result['rows']:>12,}{result['seconds']:>10.2f}{result['base_rss_mb']:>16.1f}"
+                  f"{result['peak_rss_mb']:>14.1f}{result['df_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
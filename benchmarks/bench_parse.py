@@ -0,0 +1,90 @@
+"""
+评论解析微基准
+对比旧解析方式(json.loads + 每页list.index + 逐条构造容器)与新解析方式(orjson + 按列解析)
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.bench_parse                   # 使用合成页面
+    python -m benchmarks.bench_parse --pages-dir DIR   # 使用DIR下录制的*.json原始页面
+"""
+
+import argparse
+import glob
+import json
+import time
+from datetime import datetime
+from typing import Callable, List
+
+from benchmarks.synthetic import make_comment_page
+from utility.data_acquire_parse import AcquireParseComment, loads
+from utility.data_container import CommentContainer
+
+
+def legacy_parse(response_list: List) -> List:
+    """
+    旧版parse_data的解析逻辑(补上了遗漏的append)，作为对照
+    """
+    comment_list = []
+    for response in response_list:
+        response_list.index(response)
+        for comment in response['comments']:
+            comment_container = CommentContainer()
+            comment_container.cid = comment['cid'].strip()
+            comment_container.user_name = comment['user']['nickname'].strip()
+            comment_container.comment_time = datetime.fromtimestamp(comment['create_time']).strftime("%Y-%m-%d %H:%M:%S")
+            comment_container.comment_ip = comment['ip_label']
+            comment_container.comment_content = comment['text'].strip()
+            comment_container.likes = comment['digg_count']
+            comment_container.reply_comment_total = comment['reply_comment_total']
+            comment_list.append(comment_container)
+    return comment_list
+
+
+def load_raw_pages(pages_dir: str, pages: int) -> List[bytes]:
+    """
+    读取录制的原始页面，没有指定目录时生成合成页面
+    """
+    if pages_dir:
+        raw_pages = []
+        for file_name in sorted(glob.glob(f"{pages_dir}/*.json")):
+            with open(file_name, mode="rb") as file:
+                raw_pages.append(file.read())
+        return raw_pages
+    return [json.dumps(make_comment_page("bench", i * 20, total=pages * 20), ensure_ascii=False).encode()
+            for i in range(pages)]
+
+
+def timeit(name: str, func: Callable[[], int], repeat: int) -> float:
+    """
+    重复执行取最快一次
+    """
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<28}{best * 1000:>10.1f} ms{count / best:>14,.0f} 条/秒")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评论解析微基准")
+    parser.add_argument("--pages-dir", default="", help="录制的原始页面目录")
+    parser.add_argument("--pages", type=int, default=500, help="合成页面数量")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw_pages = load_raw_pages(args.pages_dir, args.pages)
+    print(f"共{len(raw_pages)}页，{sum(len(p) for p in raw_pages) / 1024 / 1024:.1f} MB")
+
+    legacy = timeit("旧: json.loads+逐条解析",
+                    lambda: len(legacy_parse([json.loads(p) for p in raw_pages])), args.repeat)
+    fast = timeit("新: loads+parse_data",
+                  lambda: len(AcquireParseComment.parse_data([loads(p) for p in raw_pages])), args.repeat)
+    timeit("新: loads+parse_columns",
+           lambda: sum(len(AcquireParseComment.parse_columns(loads(p))['cid']) for p in raw_pages), args.repeat)
+    print(f"parse_data加速比: {legacy / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
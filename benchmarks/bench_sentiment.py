@@ -0,0 +1,109 @@
+"""
+情感推理基准
+对比按原顺序每batch_size条一批(run_model)与按长度分桶、按token预算分批(run_model_bucketed)：
+1. 填充效率：真实token数 / 填充后token数，只需要分词器
+2. CPU吞吐：条/秒，两种方式的情绪标签一致率
+3. 推理后端：ONNX Runtime(fp32/int8)相对PyTorch的吞吐和精度一致性(标签一致率、自信度最大误差)
+4. 多进程分片推理(batch_process)随进程数的扩展情况
+不使用情感缓存
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.bench_sentiment                       # 使用data/csv中的评论
+    python -m benchmarks.bench_sentiment --csv data/csv/xxx.csv --limit 5000 --token-budget 4096
+    python -m benchmarks.bench_sentiment --backends torch onnx onnx-int8
+    python -m benchmarks.bench_sentiment --processes 1 2 4 8
+"""
+
+import argparse
+import time
+from typing import List
+
+import pandas as pd
+
+from benchmarks.synthetic import sample_texts
+from utility import analyze_emo
+
+
+def padding_efficiency(batches: List[List[int]], lengths: List[int]) -> float:
+    """
+    真实token数占填充后token数的比例
+    """
+    real = sum(lengths)
+    padded = sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+    return real / padded
+
+
+def load_texts(csv_path: str, limit: int) -> List[str]:
+    """
+    读取评论内容，没有指定文件时使用data/csv中的全部评论
+    """
+    if csv_path:
+        texts = pd.read_csv(csv_path, usecols=['评论内容'])['评论内容'].dropna().astype(str).tolist()
+    else:
+        texts = list(sample_texts())
+    return texts[:limit] if limit else texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="情感推理基准")
+    parser.add_argument("--csv", default="", help="评论csv文件")
+    parser.add_argument("--limit", type=int, default=2000, help="最多使用的评论数，0表示全部")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=4096)
+    parser.add_argument("--skip-model", action="store_true", help="只统计填充效率，不运行模型")
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=analyze_emo.BACKENDS,
+                        help="要比较的推理后端，以torch为基准")
+    parser.add_argument("--processes", nargs="+", type=int, default=[], help="要测量的推理进程数")
+    args = parser.parse_args()
+
+    texts = load_texts(args.csv, args.limit)
+    lengths = [len(ids) for ids in analyze_emo.tokenizer(texts, truncation=True, max_length=128)["input_ids"]]
+    fixed_batches = [list(range(i, min(i + args.batch_size, len(texts))))
+                     for i in range(0, len(texts), args.batch_size)]
+    bucketed_batches = analyze_emo.make_length_batches(lengths, args.token_budget)
+    print(f"共{len(texts)}条评论，token数 最短{min(lengths)} 中位{sorted(lengths)[len(lengths) // 2]} 最长{max(lengths)}")
+    print(f"{'方式':<22}{'批数':>8}{'填充效率':>12}")
+    print(f"{'固定' + str(args.batch_size) + '条/批':<22}{len(fixed_batches):>8}"
+          f"{padding_efficiency(fixed_batches, lengths):>12.1%}")
+    print(f"{'分桶' + str(args.token_budget) + 'token/批':<22}{len(bucketed_batches):>8}"
+          f"{padding_efficiency(bucketed_batches, lengths):>12.1%}")
+    if args.skip_model:
+        return
+
+    analyze_emo.load_model()
+    start = time.perf_counter()
+    fixed = analyze_emo.run_model(texts, args.batch_size)
+    fixed_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    bucketed = analyze_emo.run_model_bucketed(texts, args.token_budget)
+    bucketed_seconds = time.perf_counter() - start
+
+    agreement = sum(a[0] == b[0] for a, b in zip(fixed, bucketed)) / len(texts)
+    print(f"固定分批: {len(texts) / fixed_seconds:,.1f} 条/秒 ({fixed_seconds:.1f}s)")
+    print(f"分桶分批: {len(texts) / bucketed_seconds:,.1f} 条/秒 ({bucketed_seconds:.1f}s)")
+    print(f"加速比: {fixed_seconds / bucketed_seconds:.2f}x，情绪标签一致率: {agreement:.2%}")
+
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        # 预热：导出/量化模型并创建会话，不计入耗时
+        analyze_emo.run_model_bucketed(texts[:8], args.token_budget, backend)
+        start = time.perf_counter()
+        results = analyze_emo.run_model_bucketed(texts, args.token_budget, backend)
+        seconds = time.perf_counter() - start
+        agreement = sum(a[0] == b[0] for a, b in zip(bucketed, results)) / len(texts)
+        max_error = max(abs(a[1] - b[1]) for a, b in zip(bucketed, results))
+        print(f"{backend}: {len(texts) / seconds:,.1f} 条/秒 ({seconds:.1f}s)，相对torch加速{bucketed_seconds / seconds:.2f}x，"
+              f"标签一致率{agreement:.2%}，自信度最大误差{max_error:.4f}")
+
+    for processes in args.processes:
+        start = time.perf_counter()
+        results = analyze_emo.batch_process(texts, processes, args.batch_size, args.token_budget)
+        seconds = time.perf_counter() - start
+        # 包含子进程启动和加载模型的时间
+        print(f"{processes}进程: {len(texts) / seconds:,.1f} 条/秒 ({seconds:.1f}s)，"
+              f"相对单进程{bucketed_seconds / seconds:.2f}x，结果一致: {results == bucketed}")
+
+
+if __name__ == "__main__":
+    main()
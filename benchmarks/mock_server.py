@@ -0,0 +1,155 @@
+"""
+本地模拟评论接口
+用benchmarks/synthetic.py生成的数据响应评论和回复接口，json结构与抖音接口相同，
+可以在不访问线上接口的情况下测试和测量爬虫
+
+用法(在仓库根目录运行)：
+    python -m benchmarks.mock_server --port 8765 --pages 100 --latency 0.05 --error-rate 0.01
+    DOUYIN_API_HOST=http://127.0.0.1:8765 python main.py
+"""
+
+import argparse
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from orjson import dumps
+except ImportError:
+    import json
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+from benchmarks.synthetic import make_comment_page, make_reply_page
+
+
+COMMENT_PATH = "/aweme/v1/web/comment/list/"
+REPLY_PATH = "/aweme/v1/web/comment/list/reply/"
+
+
+class MockCommentServer(ThreadingHTTPServer):
+    """
+    模拟评论接口服务器
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pages: int = 50, page_size: int = 20, replies: int = 5,
+                 latency: float = 0.0, error_rate: float = 0.0):
+        """
+        :param address: 监听地址
+        :param pages: 每个视频的评论页数
+        :param page_size: 每页评论数
+        :param replies: 每条有回复的评论的回复数
+        :param latency: 每个请求的平均延迟(秒)，实际延迟在0.5~1.5倍之间随机
+        :param error_rate: 返回503空响应的概率
+        """
+        super().__init__(address, MockCommentHandler)
+        self.pages = pages
+        self.page_size = page_size
+        self.replies = replies
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, error: bool):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+
+    @lru_cache(maxsize=4096)
+    def comment_page(self, aweme_id: str, cursor: int) -> bytes:
+        return dumps(make_comment_page(aweme_id, cursor, self.page_size, self.pages * self.page_size))
+
+    @lru_cache(maxsize=4096)
+    def reply_page(self, aweme_id: str, cid: str, cursor: int) -> bytes:
+        return dumps(make_reply_page(aweme_id, cid, cursor, total=self.replies))
+
+
+class MockCommentHandler(BaseHTTPRequestHandler):
+    """
+    处理评论/回复请求
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server: MockCommentServer = self.server
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if server.latency > 0:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+
+        error = random.random() < server.error_rate
+        server.count(error)
+        if error:
+            self.send_body(503, b"")
+            return
+
+        cursor = int(query.get("cursor", 0))
+        if url.path == COMMENT_PATH:
+            self.send_body(200, server.comment_page(query.get("aweme_id", ""), cursor))
+        elif url.path == REPLY_PATH:
+            self.send_body(200, server.reply_page(query.get("item_id", ""), query.get("comment_id", ""), cursor))
+        else:
+            self.send_body(404, b"")
+
+    def send_body(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **options) -> MockCommentServer:
+    """
+    在后台线程中启动模拟接口
+    :param host: 监听地址
+    :param port: 监听端口，为0时自动分配
+    :param options: 传给MockCommentServer的参数
+    :return: 服务器实例，server.url为接口地址，用完后调用shutdown()
+    """
+    server = MockCommentServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟评论接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=50, help="每个视频的评论页数")
+    parser.add_argument("--page-size", type=int, default=20, help="每页评论数")
+    parser.add_argument("--replies", type=int, default=5, help="每条有回复的评论的回复数")
+    parser.add_argument("--latency", type=float, default=0.0, help="平均延迟(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回503的概率")
+    args = parser.parse_args()
+
+    server = MockCommentServer((args.host, args.port), args.pages, args.page_size, args.replies,
+                               args.latency, args.error_rate)
+    print(f"模拟接口已启动: {server.url}，设置DOUYIN_API_HOST={server.url}后运行爬虫")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"共处理{server.requests}个请求，其中{server.errors}个返回错误")
+
+
+if __name__ == "__main__":
+    main()
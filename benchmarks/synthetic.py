@@ -0,0 +1,93 @@
+"""
+合成评论/回复接口数据
+生成与抖音评论接口相同结构的json页面，供基准测试和本地模拟接口使用
+评论内容从data/csv中已有的评论里随机抽取，使长度分布接近真实数据
+"""
+
+import csv
+import glob
+import random
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+
+PROVINCES = ["北京", "上海", "广东", "浙江", "江苏", "四川", "河南", "河北", "湖北", "湖南",
+             "山东", "福建", "陕西", "辽宁", "黑龙江", "内蒙古", "新疆", "香港", "美国", "日本"]
+
+
+@lru_cache(maxsize=1)
+def sample_texts() -> List[str]:
+    """
+    读取data/csv下已有的评论内容作为文本样本
+    """
+    texts: List[str] = []
+    for file_name in glob.glob("data/csv/*.csv"):
+        with open(file_name, mode="r", newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                if row.get("评论内容"):
+                    texts.append(row["评论内容"])
+    return texts or ["哈哈哈", "[赞]", "说得好", "这个视频讲得太清楚了，收藏了"]
+
+
+def make_comment(rng: random.Random, aweme_id: str, index: int) -> Dict:
+    """
+    生成一条评论
+    """
+    return {
+        "cid": str(7400000000000000000 + index),
+        "aweme_id": aweme_id,
+        "text": rng.choice(sample_texts()),
+        "create_time": int(time.time()) - rng.randint(0, 30 * 86400),
+        "digg_count": int(rng.paretovariate(1.2)) - 1,
+        "reply_comment_total": rng.choice([0, 0, 0, 0, 1, 2, 5]),
+        "ip_label": rng.choice(PROVINCES),
+        "user": {"nickname": f"用户{rng.randint(1, 10 ** 8)}", "uid": str(rng.randint(1, 10 ** 12))},
+        "status": 1,
+        "is_author_digged": False,
+    }
+
+
+def make_comment_page(aweme_id: str, cursor: int, count: int = 20, total: int = 1000) -> Dict:
+    """
+    生成一页评论
+    :param aweme_id: 视频id
+    :param cursor: 分页游标
+    :param count: 每页评论数
+    :param total: 评论总数
+    """
+    rng = random.Random(f"{aweme_id}-{cursor}")
+    end = min(cursor + count, total)
+    return {
+        "status_code": 0,
+        "comments": [make_comment(rng, aweme_id, i) for i in range(cursor, end)],
+        "cursor": end,
+        "has_more": 1 if end < total else 0,
+        "total": total,
+    }
+
+
+def make_reply_page(aweme_id: str, cid: str, cursor: int, count: int = 3, total: int = 5) -> Dict:
+    """
+    生成一页回复
+    :param aweme_id: 视频id
+    :param cid: 被回复的评论id
+    :param cursor: 分页游标
+    :param count: 每页回复数
+    :param total: 回复总数
+    """
+    rng = random.Random(f"{aweme_id}-{cid}-{cursor}")
+    end = min(cursor + count, total)
+    replies = []
+    for i in range(cursor, end):
+        reply = make_comment(rng, aweme_id, i)
+        reply["cid"] = f"{cid}{i:03d}"
+        reply["reply_id"] = cid
+        replies.append(reply)
+    return {
+        "status_code": 0,
+        "comments": replies,
+        "cursor": end,
+        "has_more": 1 if end < total else 0,
+        "total": total,
+    }
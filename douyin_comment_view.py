@@ -2,46 +2,82 @@
 抖音评论可视化分析平台
 """
 # 导入库
+import os
+
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, MATCH
 import dash_bootstrap_components as dbc
 from PIL import ImageFont
 
 # 导入自定义函数
 from utility.data_loader import load_data
+from utility import sqlite_loader
+from utility.reply_loader import load_replies, reply_path
+from utility.background_task import BackgroundTask
 from utility.data_prase import *
 from view import *
 
-def run_view(file_path):
+def get_emotion_grouped(df):
+    """
+    情绪分布统计，在后台线程中执行
+    """
+    emo_df = get_emotion_comments(df).sort_values(by='评论点赞数', ascending=False) # 情绪
+    return emo_df.groupby('情绪', as_index=False).agg(
+        评论数量=('情绪', 'count'),
+        总点赞数=('评论点赞数', 'sum'),
+        平均点赞=('评论点赞数', 'mean')
+    )
+
+# 情感分析、词云和搜索用到的列，sqlite数据只载入这些列
+COMMENT_COLUMNS = ['用户名', '评论时间', '评论内容', '评论点赞数', '评论数量', '情绪', '自信度']
+
+def run_view(file_path, debug=True):
     # 初始化Dash应用
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
     app.title = "抖音评论可视化分析平台"
     server = app.server
 
-    # 载入数据
-    df = load_data(file_path)
+    # 回复不预先载入，展开评论时按页读取
+    has_replies = reply_path(file_path) is not None
+    REPLY_PAGE_SIZE = 5
 
-    # 数据处理
-    time_df = get_time_comments(df) # 时间与评论数量
-    local_df = get_local_comments(df) # 地理与评论数量
-    hot_df = get_hot_comments(df) # 点赞量最高的10条评论
-
-    emo_df = get_emotion_comments(df).sort_values(by='评论点赞数', ascending=False) # 情绪
-    df_grouped = emo_df.groupby('情绪', as_index=False).agg(
-        评论数量=('情绪', 'count'),
-        总点赞数=('评论点赞数', 'sum'),
-        平均点赞=('评论点赞数', 'mean')
-    )
+    # 载入数据与数据处理
+    if file_path.endswith('.db'):
+        # sqlite中的数据直接用sql聚合，不需要先载入整张表；情感分析、词云和搜索用到的列在后台载入
+        data_task = BackgroundTask("载入评论", load_data, file_path, columns=COMMENT_COLUMNS)
+        time_df = sqlite_loader.get_time_comments(file_path)
+        local_df = sqlite_loader.get_local_comments(file_path)
+        hot_df = sqlite_loader.get_hot_comments(file_path)
+    else:
+        df = load_data(file_path)
+        data_task = BackgroundTask("载入评论", lambda: df).start()
+        time_df = get_time_comments(df) # 时间与评论数量
+        local_df = get_local_comments(df) # 地理与评论数量
+        hot_df = get_hot_comments(df) # 点赞量最高的10条评论
 
+    def get_comments():
+        """
+        情感分析、词云和搜索使用的评论数据，后台载入完成前阻塞
+        """
+        data_task.start().wait()
+        if data_task.error is not None:
+            raise RuntimeError(f"评论数据载入失败: {data_task.error}")
+        return data_task.result
 
-    # 在现有可视化数据部分添加
-    wordcloud_img = get_wordcloud_figure(df['评论内容'].tolist())
+    # 情感推理和词云耗时长，放在后台线程中计算，页面先展示其它图表，结果就绪后由poll_emotion、poll_wordcloud填充
+    emotion_task = BackgroundTask("情感分析", lambda: get_emotion_grouped(get_comments()))
+    wordcloud_task = BackgroundTask("词云", lambda: get_wordcloud_figure(get_comments()['评论内容'].tolist()))
+    # debug模式下werkzeug的重载监视进程也会执行到这里，只在实际提供服务的进程中计算
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        data_task.start()
+        emotion_task.start()
+        wordcloud_task.start()
 
     # 可视化数据
     local_fig = create_local_figure(local_df)
     hot_fig = create_hot_figure(hot_df)
-    emo_pie = create_emotion_pie(df_grouped)
-    emo_bar = create_emotion_bar(df_grouped)
+    emo_pie = create_placeholder_figure("情感分析中...")
+    emo_bar = create_placeholder_figure("情感分析中...")
 
     # 时间与评论数量
     date_options = [{'label': str(date), 'value': date} for date in time_df['日期'].unique()]
@@ -213,9 +249,9 @@ def run_view(file_path):
                     html.H4("评论关键词云图", 
                         className="mb-3",
                         style={'color': '#2c3e50', 'fontSize': '24px'}),
+                    html.P("词云生成中...", id='wordcloud-status', className="text-muted"),
                     html.Img(
                         id='wordcloud-image',
-                        src=wordcloud_img,
                         style={
                             'height': '92%',  # 增加图片占比
                             'objectFit': 'cover',  # 改为cover填充
@@ -263,6 +299,10 @@ def run_view(file_path):
                 className="h-100 d-flex flex-column"
             )
         ], className='g-3', style={'minHeight': '60vh'}),  # 增加行高
+
+        # 轮询后台计算的结果
+        dcc.Interval(id='emotion-poll', interval=2000),
+        dcc.Interval(id='wordcloud-poll', interval=2000),
     ], fluid=True, style={
         'padding': '1.5rem',  # 容器边距减少
         'background': 'linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%)',
@@ -284,6 +324,34 @@ def run_view(file_path):
         """
         return create_time_figure(time_df, selected_date)
 
+    # 后台计算完成后填充情绪图和词云，各自完成后停止轮询
+    @app.callback(
+        Output('emotion-pie', 'figure'),
+        Output('emotion-bar', 'figure'),
+        Output('emotion-poll', 'disabled'),
+        Input('emotion-poll', 'n_intervals')
+    )
+    def poll_emotion(n_intervals):
+        if not emotion_task.start().done:
+            return dash.no_update, dash.no_update, False
+        if emotion_task.error is not None:
+            placeholder = create_placeholder_figure("情感分析失败")
+            return placeholder, placeholder, True
+        return create_emotion_pie(emotion_task.result), create_emotion_bar(emotion_task.result), True
+
+    @app.callback(
+        Output('wordcloud-image', 'src'),
+        Output('wordcloud-status', 'children'),
+        Output('wordcloud-poll', 'disabled'),
+        Input('wordcloud-poll', 'n_intervals')
+    )
+    def poll_wordcloud(n_intervals):
+        if not wordcloud_task.start().done:
+            return dash.no_update, dash.no_update, False
+        if wordcloud_task.error is not None:
+            return None, "词云生成失败", True
+        return wordcloud_task.result, None, True
+
     # 评论内容搜索
     @app.callback(
         Output('comment-list', 'children'),
@@ -296,7 +364,13 @@ def run_view(file_path):
                 html.P("输入关键词搜索精彩评论...", className="text-muted")
             ], className="text-center")
         
+        if not data_task.start().wait(timeout=1):
+            return html.Div([
+                html.P("评论数据载入中，请稍后再搜索...", className="text-muted")
+            ], className="text-center")
+
         try:
+            df = get_comments()
             filtered = df[df['评论内容'].str.contains(search_text, case=False, na=False)]
             if filtered.empty:
                 return html.Div([
@@ -311,9 +385,15 @@ def run_view(file_path):
                         row['评论内容']
                     ], className="mb-1"),
                     html.Small(f"❤️ {row['评论点赞数']} | 📅 {row['评论时间']}"),
+                    *([
+                        html.Div(id={'type': 'reply-list', 'cid': str(cid)}, children=[], className="ms-3"),
+                        html.Button(f"展开{row['评论数量']}条回复",
+                                    id={'type': 'reply-more', 'cid': str(cid)},
+                                    className="btn btn-link btn-sm p-0")
+                    ] if has_replies and row.get('评论数量', 0) > 0 else []),
                     html.Hr(className="my-2")
                 ], className="comment-item p-2 hover-bg") 
-                for _, row in filtered.head(20).iterrows()
+                for cid, row in filtered.head(20).iterrows()
             ]
         except Exception as e:
             return html.Div([
@@ -321,12 +401,38 @@ def run_view(file_path):
                 html.P("搜索服务暂时不可用", className="text-danger mt-2")
             ], className="text-center")
 
+    # 展开回复：每次点击读取下一页
+    @app.callback(
+        Output({'type': 'reply-list', 'cid': MATCH}, 'children'),
+        Output({'type': 'reply-more', 'cid': MATCH}, 'children'),
+        Output({'type': 'reply-more', 'cid': MATCH}, 'disabled'),
+        Input({'type': 'reply-more', 'cid': MATCH}, 'n_clicks'),
+        State({'type': 'reply-more', 'cid': MATCH}, 'id'),
+        State({'type': 'reply-list', 'cid': MATCH}, 'children'),
+        prevent_initial_call=True
+    )
+    def expand_replies(n_clicks, button_id, children):
+        children = children or []
+        replies, total = load_replies(file_path, button_id['cid'], len(children), REPLY_PAGE_SIZE)
+        children = children + [
+            html.P([
+                html.Span(f"{reply['用户名']}: ", className="fw-bold"),
+                reply['回复内容'],
+                html.Small(f" ❤️ {reply['回复点赞数']}", className="text-muted")
+            ], className="mb-1 small")
+            for reply in replies
+        ]
+        remaining = total - len(children)
+        if remaining > 0 and replies:
+            return children, f"更多回复({remaining})", False
+        return children, "没有更多回复", True
+
     # 样式配置
     app.css.append_css({
     'external_url': 'assets/styles.css'
 })
 
-    app.run_server(debug=True) 
+    app.run_server(debug=debug) 
 
 """ if __name__ == '__main__':
         # 从URL中提取视频ID
@@ -5,22 +5,101 @@
 """
 
 
-from utility.data_acquire_parse import AcquireParseComment
+import asyncio
+from typing import Dict, List, Optional
+
+from utility.checkpoint import CrawlCheckpoint
+from utility.crawl_pipeline import CrawlPipeline, maybe_await
+from utility.crawl_scheduler import CrawlScheduler
+from utility.page_archive import PageArchive
+from utility.reply_pool import ReplyWorkerPool
 from store import StoreFactory
 
 
-def run_crawler(aweme_id:str):
+def run_crawler(aweme_id:str, store_type:str="csv", queue_size:int=4,
+                reply_workers:int=0, reply_rate:float=5.0,
+                resume:bool=True, incremental:bool=False, archive:Optional[str]="gzip",
+                sentiment:bool=False) -> int:
+    """
+    爬虫主函数
+    获取、解析、存储三个阶段以流水线方式同时运行，每获取一页就立即解析并保存
+    :param aweme_id: 视频id
+    :param store_type: 存储类型
+    :param queue_size: 阶段之间队列的最大长度(页数)，存储较慢时会反压获取阶段
+    :param reply_workers: 回复爬取worker数量，为0时不获取回复
+    :param reply_rate: 回复请求的总速率(次/秒)
+    :param resume: 是否从上次中断的断点继续
+    :param incremental: 增量模式，遇到整页评论都已在存储中时停止翻页
+    :param archive: 原始页面归档的压缩方式(gzip/zstd)，为None时不归档
+    :param sentiment: 是否在爬取时对评论做情感分析，情绪和自信度与评论一起保存
+    :return: 爬取的页数
+    """
+    async def crawl() -> int:
+        checkpoint = CrawlCheckpoint.load(aweme_id) if resume else CrawlCheckpoint(aweme_id)
+        page_archive = PageArchive(aweme_id, archive) if archive else None
+        with StoreFactory.get_store(store_type) as store:
+            if reply_workers <= 0:
+                return await CrawlPipeline(aweme_id, store, queue_size, checkpoint=checkpoint,
+                                           incremental=incremental, archive=page_archive,
+                                           sentiment=sentiment).run()
+            async with ReplyWorkerPool(reply_workers, reply_rate) as reply_pool:
+                return await CrawlPipeline(aweme_id, store, queue_size, reply_pool=reply_pool,
+                                           checkpoint=checkpoint, incremental=incremental,
+                                           archive=page_archive, sentiment=sentiment).run()
+
+    return asyncio.run(crawl())
+
+
+def run_crawlers(targets:List[str], store_type:str="csv", max_concurrency:int=8, host_rate:float=5.0,
+                 reply_workers:int=0, reply_rate:float=5.0,
+                 resume:bool=True, incremental:bool=False,
+                 archive:Optional[str]="gzip", sentiment:bool=False) -> Dict[str,int]:
     """
-    爬虫主函数  
+    同时爬取多个视频
+    :param targets: aweme_id或视频URL列表
+    :param store_type: 存储类型
+    :param max_concurrency: 全局并发请求数上限
+    :param host_rate: 每个host每秒允许的请求数
+    :param reply_workers: 回复爬取worker数量，为0时不获取回复
+    :param reply_rate: 回复请求的总速率(次/秒)
+    :param resume: 是否从上次中断的断点继续
+    :param incremental: 增量模式，遇到整页评论都已在存储中时停止翻页
+    :param archive: 原始页面归档的压缩方式(gzip/zstd)，为None时不归档
+    :param sentiment: 是否在爬取时对评论做情感分析，情绪和自信度与评论一起保存
+    :return: 每个视频爬取的页数，失败的视频记为-1
     """
-    # 1. 发送请求，获取响应的api(comment_api,reply_api)
-    comment_response_list = AcquireParseComment.acquire_data(aweme_id)
-    # 2. 解析响应的api，获取评论数据,并将评论存储到容器中
-    comment_list = AcquireParseComment.parse_data(comment_response_list)
-    # 3. 将评论数据存储到本地
-    store = StoreFactory.get_store("csv")
-    for comment in comment_list:
-        store.save_data(comment,aweme_id)
+    scheduler = CrawlScheduler(store_type, max_concurrency, host_rate,
+                               reply_workers=reply_workers, reply_rate=reply_rate,
+                               resume=resume, incremental=incremental, archive=archive,
+                               sentiment=sentiment)
+    return asyncio.run(scheduler.run(targets))
+
+
+def replay_crawler(aweme_id:str, store_type:str="csv", with_replies:bool=True, sentiment:bool=False) -> int:
+    """
+    从原始页面归档重新解析并保存，不发送任何网络请求
+    修改解析或存储逻辑后用它重建数据，而不必重新爬取
+    :param aweme_id: 视频id
+    :param store_type: 存储类型
+    :param with_replies: 是否还原归档中的回复
+    :param sentiment: 是否对评论做情感分析，情绪和自信度与评论一起保存
+    :return: 保存的评论数
+    """
+    async def replay() -> int:
+        if sentiment:
+            from utility.analyze_emo import score_batch
+        comments = 0
+        with StoreFactory.get_store(store_type) as store, PageArchive.open_existing(aweme_id) as page_archive:
+            for comment_list in page_archive.replay(with_replies):
+                if sentiment:
+                    score_batch(comment_list)
+                await maybe_await(store.save_many(comment_list, aweme_id))
+                comments += len(comment_list)
+            await maybe_await(store.flush(aweme_id))
+        print(f"[{aweme_id}] 重放完成，共{comments}条评论")
+        return comments
+
+    return asyncio.run(replay())
 
 
 
@@ -3,18 +3,31 @@
 1. csv存储类
 2. json存储类
 3. 数据库存储类
+4. parquet存储类
+5. json lines存储类
+6. sqlite存储类
 """
 import csv
+import io
 import os
 import pathlib
 import json
-from typing import Optional
+import sqlite3
 from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 
 from utility.abstract_class import AbstractStore
 from utility.asyn_db import AsyncMysqlDB, MysqlConnect
-from utility.data_container import CommentContainer
+from utility.data_container import CommentBatch, CommentContainer
+from utility.jsonl import iter_records, repair_tail
 
 
 
@@ -22,7 +35,7 @@ class StoreFactory:
     """
     存储工厂类
     根据不同的存储类型，返回不同的存储实现类
-    支持CSV、JSON、数据库三种存储方式
+    支持CSV、JSON、JSON Lines、数据库(MySQL)、SQLite、Parquet六种存储方式
     """
 
     @staticmethod
@@ -31,8 +44,14 @@ class StoreFactory:
             return CsvStore()
         elif data_save_type == "json":
             return JsonStore()
+        elif data_save_type == "jsonl":
+            return JsonLinesStore()
         elif data_save_type == "database":
             return DatabaseStore()
+        elif data_save_type == "sqlite":
+            return SqliteStore()
+        elif data_save_type == "parquet":
+            return ParquetStore()
         else:
             raise ValueError(f"不支持的存储类型: {data_save_type}")
 
@@ -41,13 +60,27 @@ class StoreFactory:
 class CsvStore(AbstractStore):
     """
     csv存储类
+    每个视频的csv文件在整个爬取过程中只打开一次，表头只在新建文件时写入
+    配合with语句使用，退出时关闭所有文件
+    回复保存在{aweme_id}_reply.csv中，同一条评论的回复连续写入；
+    {aweme_id}_reply.idx每行记录一条评论的回复在_reply.csv中的 评论cid,字节偏移,字节数,回复数，
+    读取一条评论的回复只需要一次seek(见utility/reply_loader.py)
+    情绪、自信度两列在爬取时开启情感分析才有值；追加到没有这两列的旧文件时沿用旧表头，
+    直到第一批带情感分析结果的评论写入时把旧文件重写一次，补上这两列(旧评论的这两列为空)
     """
+    headers = ['CID', '用户名', '评论时间',
+               '评论地点', '评论内容', '评论点赞数','评论数量', '情绪', '自信度']
+    reply_headers = ['CID', '回复的评论CID', '用户名', '回复内容', '回复点赞数']
 
     def __init__(self):
         """
         初始化
         """
         self.file_path = "data/csv"
+        self.files = {}
+        self.writers = {}
+        self.with_sentiment = {}
+        self.reply_files = {}
 
     def make_file_path(self,aweme_id:str):
         """
@@ -55,66 +88,180 @@ class CsvStore(AbstractStore):
         """
         return f"{self.file_path}/{aweme_id}.csv"
 
-    def save_data(self,save_item:CommentContainer,aweme_id:str):
+    def load_cids(self,aweme_id:str) -> Set[str]:
         """
-        保存数据
-        :param save_item: 保存的评论数据
-        :param aweme_id: 视频id
-        :return: 
+        读取已保存的评论cid
         """
-        # 创建目录
-        pathlib.Path(self.make_file_path(aweme_id)).parent.mkdir(parents=True,exist_ok=True)
+        self.flush(aweme_id)
         file_name = self.make_file_path(aweme_id)
-        
-        # 判断文件是否存在，如果不存在则写入表头
-        file_exists = os.path.exists(file_name)
-        
+        if not os.path.exists(file_name):
+            return set()
+        with open(file_name, mode='r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            return {row[0] for row in reader if row}
 
-        # 准备评论数据
-        comment_data = [
+    def make_reply_path(self,aweme_id:str):
+        """
+        创建回复文件路径
+        """
+        return f"{self.file_path}/{aweme_id}_reply.csv"
+
+    def make_index_path(self,aweme_id:str):
+        """
+        创建回复索引文件路径
+        """
+        return f"{self.file_path}/{aweme_id}_reply.idx"
+
+    def get_reply_files(self,aweme_id:str):
+        """
+        获取视频对应的回复文件和索引文件，第一次调用时打开
+        回复文件以二进制追加模式打开，tell()即为下一段回复的字节偏移
+        """
+        files = self.reply_files.get(aweme_id)
+        if files is None:
+            file_name = self.make_reply_path(aweme_id)
+            pathlib.Path(file_name).parent.mkdir(parents=True,exist_ok=True)
+            file_exists = os.path.exists(file_name)
+            reply_file = open(file_name, mode='ab', buffering=1024 * 1024)
+            if not file_exists:
+                reply_file.write((','.join(self.reply_headers) + '\r\n').encode('utf-8'))
+            index_file = open(self.make_index_path(aweme_id), mode='a', encoding='utf-8')
+            files = self.reply_files[aweme_id] = (reply_file, index_file)
+        return files
+
+    def get_writer(self,aweme_id:str):
+        """
+        获取视频对应的csv writer，第一次调用时打开文件
+        """
+        writer = self.writers.get(aweme_id)
+        if writer is None:
+            file_name = self.make_file_path(aweme_id)
+            # 创建目录
+            pathlib.Path(file_name).parent.mkdir(parents=True,exist_ok=True)
+            # 判断文件是否存在，如果不存在则写入表头，存在则按已有表头决定是否写情绪列
+            file_exists = os.path.exists(file_name) and os.path.getsize(file_name) > 0
+            headers = self.headers
+            if file_exists:
+                with open(file_name, mode='r', newline='', encoding='utf-8') as file:
+                    headers = next(csv.reader(file), headers)
+            file = open(file_name, mode='a', newline='', encoding='utf-8', buffering=1024 * 1024)
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            self.with_sentiment[aweme_id] = '情绪' in headers
+            self.files[aweme_id] = file
+            self.writers[aweme_id] = writer
+        return writer
+
+    @staticmethod
+    def make_row(save_item:CommentContainer) -> List:
+        """
+        将评论数据转换为csv的一行
+        """
+        return [
             save_item.cid,
             save_item.user_name,
             save_item.comment_time,
             save_item.comment_ip,
             save_item.comment_content,
             save_item.likes,
-            len(save_item.comment_reply)
+            len(save_item.comment_reply),
+            save_item.emotion,
+            save_item.confidence
         ]
-        
-            
-        # 写入CSV文件
-        with open(file_name, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            
-            # 如果文件不存在，写入表头
-            if not file_exists:
-                headers = ['CID', '用户名', '评论时间', 
-                           '评论地点', '评论内容', '评论点赞数','评论数量']
-                writer.writerow(headers)
 
-            # 写入数据行
-            writer.writerow(comment_data)
+    def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据
+        :param save_item: 保存的评论数据
+        :param aweme_id: 视频id
+        :return: 
+        """
+        self.save_many([save_item],aweme_id)
+
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据
+        :param save_items: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        batch = CommentBatch.of(save_items)
+        writer = self.get_writer(aweme_id)
+        if not self.with_sentiment[aweme_id] and batch.has_sentiment():
+            writer = self.add_sentiment_columns(aweme_id)
+        columns = [batch.cid, batch.user_name, batch.comment_time, batch.comment_ip,
+                   batch.comment_content, batch.likes, batch.reply_nums()]
+        if self.with_sentiment[aweme_id]:
+            columns += [batch.emotion, batch.confidence]
+        writer.writerows(zip(*columns))
+        self.save_replies(batch,aweme_id)
+
+    def add_sentiment_columns(self,aweme_id:str):
+        """
+        给没有情绪、自信度两列的旧文件补上这两列，已有的评论这两列为空
+        先写临时文件再替换原文件，之后重新以追加模式打开
+        :param aweme_id: 视频id
+        :return: 重新打开的csv writer
+        """
+        self.files.pop(aweme_id).close()
+        del self.writers[aweme_id]
+        file_name = self.make_file_path(aweme_id)
+        tmp_name = f"{file_name}.tmp"
+        with open(file_name, mode='r', newline='', encoding='utf-8') as source, \
+                open(tmp_name, mode='w', newline='', encoding='utf-8') as target:
+            reader = csv.reader(source)
+            headers = next(reader)
+            extra = [header for header in self.headers if header not in headers]
+            writer = csv.writer(target)
+            writer.writerow(headers + extra)
+            writer.writerows(row + [''] * (len(headers) + len(extra) - len(row)) for row in reader)
+        os.replace(tmp_name, file_name)
+        print(f"{file_name}没有情绪、自信度两列，已补上这两列")
+        return self.get_writer(aweme_id)
+
+    def save_replies(self,batch:CommentBatch,aweme_id:str):
+        """
+        保存一批评论的回复，每条评论的回复作为连续的一段写入并记录索引
+        :param batch: 评论数据
+        :param aweme_id: 视频id
+        """
+        for cid, replies in zip(batch.cid, batch.comment_reply):
+            if not replies:
+                continue
+            reply_file, index_file = self.get_reply_files(aweme_id)
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                (reply.cid, cid, reply.user_name, reply.reply_content, reply.likes) for reply in replies
+            )
+            data = buffer.getvalue().encode('utf-8')
+            index_file.write(f"{cid},{reply_file.tell()},{len(data)},{len(replies)}\n")
+            reply_file.write(data)
+
+    def flush(self,aweme_id:str):
+        """
+        将缓冲区写入文件，回复文件先于索引写入，索引中的位置总是有效的
+        """
+        file = self.files.get(aweme_id)
+        if file is not None:
+            file.flush()
+        for file in self.reply_files.get(aweme_id, ()):
+            file.flush()
+
+    def close(self):
+        """
+        关闭所有文件
+        """
+        for file in self.files.values():
+            file.close()
+        for reply_file, index_file in self.reply_files.values():
+            reply_file.close()
+            index_file.close()
+        self.files.clear()
+        self.writers.clear()
+        self.with_sentiment.clear()
+        self.reply_files.clear()
 
-        # 准备回复数据
-"""         reply_data = []
-        for reply in save_item.comment_reply:
-            reply_data.append([
-                reply.cid,
-                reply.reply_id,
-                reply.user_name,
-                reply.reply_content,
-                reply.likes
-            ])
-            
-        with open(file_name.replace(".csv","_reply.csv"), mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            # 如果文件不存在，写入表头
-            if not file_exists:
-                headers = ['CID', '回复的评论CID', '用户名', '回复内容', '回复点赞数']
-                writer.writerow(headers)
-            # 写入数据行
-            writer.writerows(reply_data)
-            print(reply_data) """
 
 
 
@@ -133,19 +280,25 @@ class JsonStore(AbstractStore):
         创建文件路径
         """
         return f"{self.file_path}/{aweme_id}.json"
-    
-    def save_data(self,save_item:CommentContainer,aweme_id:str):
+
+    def load_cids(self,aweme_id:str) -> Set[str]:
         """
-        保存数据
-        :param save_item: 保存的评论数据
-        :param aweme_id: 视频id
-        :return: 
+        读取已保存的评论cid
         """
-        # 创建目录
-        pathlib.Path(self.make_file_path(aweme_id)).parent.mkdir(parents=True,exist_ok=True)
         file_name = self.make_file_path(aweme_id)
-        
-        # 将评论数据转换为字典格式
+        if not os.path.exists(file_name):
+            return set()
+        with open(file_name, mode="r", encoding="utf-8") as file:
+            try:
+                return {item["cid"] for item in json.load(file)}
+            except json.JSONDecodeError:
+                return set()
+    
+    @staticmethod
+    def make_dict(save_item:CommentContainer) -> Dict:
+        """
+        将评论数据转换为字典格式
+        """
         comment_dict = {
             "cid": save_item.cid,
             "user_name": save_item.user_name,
@@ -153,6 +306,8 @@ class JsonStore(AbstractStore):
             "comment_ip": save_item.comment_ip,
             "comment_content": save_item.comment_content,
             "likes": save_item.likes,
+            "emotion": save_item.emotion,
+            "confidence": save_item.confidence,
             "replies": []
         }
         
@@ -165,6 +320,26 @@ class JsonStore(AbstractStore):
                 "likes": reply.likes
             }
             comment_dict["replies"].append(reply_dict)
+        return comment_dict
+
+    def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据
+        :param save_item: 保存的评论数据
+        :param aweme_id: 视频id
+        :return: 
+        """
+        self.save_many([save_item],aweme_id)
+
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据，一批评论只读写一次文件
+        :param save_items: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        # 创建目录
+        pathlib.Path(self.make_file_path(aweme_id)).parent.mkdir(parents=True,exist_ok=True)
+        file_name = self.make_file_path(aweme_id)
         
         save_item_list = []
         # 如果文件存在，则读取文件中的数据
@@ -176,7 +351,7 @@ class JsonStore(AbstractStore):
                     save_item_list = []
         
         # 将新的评论数据添加到列表中
-        save_item_list.append(comment_dict)
+        save_item_list.extend(self.make_dict(save_item) for save_item in save_items)
         
         # 将数据保存到文件中
         with open(file_name, mode="w", encoding="utf-8") as file:
@@ -185,39 +360,420 @@ class JsonStore(AbstractStore):
 
 
 
+class JsonLinesStore(AbstractStore):
+    """
+    json lines存储类
+    每条评论一行，只追加写入，不需要读取已有数据；回复嵌套在replies字段中
+    同一条评论多次爬取会留下多行，可以用compact去重
+    """
+    def __init__(self):
+        """
+        初始化
+        """
+        self.file_path = "data/jsonl"
+        self.files = {}
+
+    def make_file_path(self,aweme_id:str):
+        """
+        创建文件路径
+        """
+        return f"{self.file_path}/{aweme_id}.jsonl"
+
+    def load_cids(self,aweme_id:str) -> Set[str]:
+        """
+        读取已保存的评论cid
+        """
+        self.flush(aweme_id)
+        file_name = self.make_file_path(aweme_id)
+        if not os.path.exists(file_name):
+            return set()
+        return {record["cid"] for record in iter_records(file_name)}
+
+    def get_file(self,aweme_id:str):
+        """
+        获取视频对应的文件句柄，第一次调用时以追加模式打开
+        上次爬取中断留下的不完整的最后一行先修复，新记录不会接在它后面
+        """
+        file = self.files.get(aweme_id)
+        if file is None:
+            file_name = self.make_file_path(aweme_id)
+            pathlib.Path(file_name).parent.mkdir(parents=True,exist_ok=True)
+            repair_tail(file_name)
+            file = open(file_name, mode="a", encoding="utf-8", buffering=1024 * 1024)
+            self.files[aweme_id] = file
+        return file
+
+    def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据
+        :param save_item: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        self.save_many([save_item],aweme_id)
+
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据
+        :param save_items: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        self.get_file(aweme_id).writelines(
+            json.dumps(JsonStore.make_dict(save_item), ensure_ascii=False) + "\n"
+            for save_item in save_items
+        )
+
+    def flush(self,aweme_id:str):
+        """
+        将缓冲区写入文件
+        """
+        file = self.files.get(aweme_id)
+        if file is not None:
+            file.flush()
+
+    def close(self):
+        """
+        关闭所有文件
+        """
+        for file in self.files.values():
+            file.close()
+        self.files.clear()
+
+    def compact(self,aweme_id:str) -> int:
+        """
+        按cid去重，同一条评论只保留最后一次爬取的记录
+        先写临时文件再替换原文件
+        :param aweme_id: 视频id
+        :return: 去掉的重复记录数
+        """
+        file = self.files.pop(aweme_id, None)
+        if file is not None:
+            file.close()
+        file_name = self.make_file_path(aweme_id)
+        if not os.path.exists(file_name):
+            return 0
+
+        total = 0
+        records = {}
+        for record in iter_records(file_name):
+            total += 1
+            records.pop(record["cid"], None)
+            records[record["cid"]] = record
+
+        tmp_name = f"{file_name}.tmp"
+        with open(tmp_name, mode="w", encoding="utf-8") as file:
+            file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records.values())
+        os.replace(tmp_name, file_name)
+        print(f"[{aweme_id}] 压缩完成，{total}条记录去重后剩余{len(records)}条")
+        return total - len(records)
+
+
+
+
 class DatabaseStore(AbstractStore):
     """
     数据库存储类
+    save_many先把评论缓冲起来，攒够batch_size条或调用flush时，
+    通过 INSERT ... ON DUPLICATE KEY UPDATE 把评论和回复在一个事务中整批写入，已存在的评论会被更新
+    回复写入douyin_reply表(cid为主键，reply_id为被回复的评论cid，需要建索引)
+    爬取时开启情感分析时，评论表需要有emotion、confidence两列：
+        ALTER TABLE douyin_comment ADD COLUMN emotion VARCHAR(8), ADD COLUMN confidence DOUBLE;
     """
-    def __init__(self):
+    def __init__(self, batch_size: int = 2000):
         """
         初始化
+        :param batch_size: 每批写入的评论条数
         """
         self.db: Optional[AsyncMysqlDB] = None
         self.mysql_connect = None
+        self.batch_size = batch_size
+        self.flush_pages = max(1, batch_size // 20)
+        self.buffers: Dict[str, CommentBatch] = {}
         
     async def init_db(self):
+        # 每个事件循环有各自的连接池，每次都取当前事件循环的连接池
         if not self.mysql_connect:
             self.mysql_connect = MysqlConnect()
-            self.db = (await self.mysql_connect.async_init()).get_db()
+        self.db = (await self.mysql_connect.async_init()).get_db()
             
-    async def save_data(self,save_item:CommentContainer,aweme_id:str):
+    async def load_cids(self,aweme_id:str) -> Set[str]:
         """
-        保存数据
+        读取已保存的评论cid
+        评论表中没有视频id字段，这里返回表中全部cid
+        """
+        await self.init_db()
+        rows = await self.db.query("select cid from douyin_comment")
+        return {row["cid"] for row in rows}
+
+    async def write(self,save_items:Iterable[CommentContainer]):
+        """
+        整批写入数据库，评论和回复在同一个事务中写入，失败时整批回滚
         """
         try:
             await self.init_db()
-            from utility.utility import insert_comment,update_comment,query_comment_by_cid
-            
-            comment = await query_comment_by_cid(self.db,"douyin_comment",save_item.cid)
-            if comment.cid:  # 修改判断条件
-                print(f"更新评论: {save_item.cid}")
-                await update_comment(self.db,"douyin_comment",save_item)
-            else:
-                print(f"插入评论: {save_item.cid}")
-                await insert_comment(self.db,"douyin_comment",save_item)
-                
+            from utility.utility import upsert_comments, upsert_replies
+            batch = CommentBatch.of(save_items)
+            async with self.db.transaction() as cur:
+                await upsert_comments(self.db,"douyin_comment",batch,cur)
+                await upsert_replies(self.db,"douyin_reply",batch,cur)
         except Exception as e:
             print(f"保存数据失败: {e}")
             raise e
+
+    async def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据，立即写入
+        """
+        await self.write([save_item])
+
+    async def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据，缓冲区满时写入
+        """
+        buffer = self.buffers.setdefault(aweme_id, CommentBatch())
+        buffer.extend(save_items)
+        if len(buffer) >= self.batch_size:
+            await self.flush(aweme_id)
+
+    async def flush(self,aweme_id:str):
+        """
+        写入缓冲的评论
+        """
+        save_items = self.buffers.pop(aweme_id, None)
+        if save_items:
+            await self.write(save_items)
         
+
+
+
+class SqliteStore(AbstractStore):
+    """
+    sqlite存储类
+    每个视频一个数据库文件，不需要数据库服务，适合本地分析和CI
+    1. WAL模式，读(仪表盘)写(爬虫)互不阻塞
+    2. save_many整批评论在一个事务中写入，已存在的评论会被更新
+    3. cid为主键，comment_time、comment_ip、likes建有索引，仪表盘的聚合可以直接在sqlite中完成
+    4. 回复保存在douyin_reply表，reply_id(被回复的评论cid)建有索引，按评论读取回复不需要扫表
+    5. emotion、confidence保存爬取时的情感分析结果，旧数据库在打开时补上这两列；
+       再次爬取同一条评论而没有做情感分析时保留已有结果
+    """
+    table_name = "douyin_comment"
+    reply_table_name = "douyin_reply"
+
+    def __init__(self):
+        """
+        初始化
+        """
+        self.file_path = "data/sqlite"
+        self.connections: Dict[str, sqlite3.Connection] = {}
+
+    def make_file_path(self,aweme_id:str):
+        """
+        创建文件路径
+        """
+        return f"{self.file_path}/{aweme_id}.db"
+
+    def get_connection(self,aweme_id:str) -> sqlite3.Connection:
+        """
+        获取视频对应的数据库连接，第一次调用时建表建索引
+        """
+        conn = self.connections.get(aweme_id)
+        if conn is None:
+            file_name = self.make_file_path(aweme_id)
+            pathlib.Path(file_name).parent.mkdir(parents=True,exist_ok=True)
+            conn = sqlite3.connect(file_name)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    cid TEXT PRIMARY KEY,
+                    user_name TEXT,
+                    comment_time TEXT,
+                    comment_ip TEXT,
+                    comment_content TEXT,
+                    reply_num INTEGER,
+                    likes INTEGER,
+                    emotion TEXT,
+                    confidence REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_comment_time ON {self.table_name} (comment_time);
+                CREATE INDEX IF NOT EXISTS idx_comment_ip ON {self.table_name} (comment_ip);
+                CREATE INDEX IF NOT EXISTS idx_likes ON {self.table_name} (likes);
+                CREATE TABLE IF NOT EXISTS {self.reply_table_name} (
+                    cid TEXT PRIMARY KEY,
+                    reply_id TEXT,
+                    user_name TEXT,
+                    reply_content TEXT,
+                    likes INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_reply_id ON {self.reply_table_name} (reply_id);
+            """)
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")}
+            for column, column_type in (("emotion", "TEXT"), ("confidence", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {self.table_name} ADD COLUMN {column} {column_type}")
+            self.connections[aweme_id] = conn
+        return conn
+
+    def load_cids(self,aweme_id:str) -> Set[str]:
+        """
+        读取已保存的评论cid
+        """
+        if aweme_id not in self.connections and not os.path.exists(self.make_file_path(aweme_id)):
+            return set()
+        rows = self.get_connection(aweme_id).execute(f"SELECT cid FROM {self.table_name}")
+        return {row[0] for row in rows}
+
+    def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据
+        :param save_item: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        self.save_many([save_item],aweme_id)
+
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据，整批评论和它们的回复在一个事务中写入
+        :param save_items: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        batch = CommentBatch.of(save_items)
+        conn = self.get_connection(aweme_id)
+        with conn:
+            conn.executemany(f"""
+                INSERT INTO {self.table_name}
+                    (cid, user_name, comment_time, comment_ip, comment_content, reply_num, likes,
+                     emotion, confidence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cid) DO UPDATE SET
+                    user_name=excluded.user_name,
+                    comment_time=excluded.comment_time,
+                    comment_ip=excluded.comment_ip,
+                    comment_content=excluded.comment_content,
+                    reply_num=excluded.reply_num,
+                    likes=excluded.likes,
+                    emotion=COALESCE(excluded.emotion, emotion),
+                    confidence=COALESCE(excluded.confidence, confidence)
+            """, zip(batch.cid, batch.user_name, batch.comment_time, batch.comment_ip,
+                     batch.comment_content, batch.reply_nums(), batch.likes,
+                     batch.emotion, batch.confidence))
+            conn.executemany(f"""
+                INSERT INTO {self.reply_table_name} (cid, reply_id, user_name, reply_content, likes)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(cid) DO UPDATE SET
+                    reply_id=excluded.reply_id,
+                    user_name=excluded.user_name,
+                    reply_content=excluded.reply_content,
+                    likes=excluded.likes
+            """, [
+                (reply.cid, cid, reply.user_name, reply.reply_content, reply.likes)
+                for cid, replies in zip(batch.cid, batch.comment_reply) for reply in replies
+            ])
+
+    def close(self):
+        """
+        关闭所有连接
+        """
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+
+
+
+class ParquetStore(AbstractStore):
+    """
+    parquet存储类
+    每个视频一个目录，缓冲的评论每攒够row_group_size条写成一个parquet文件(一个row group)
+    列名与csv一致，评论时间保存为时间戳类型，读取时可以按列投影、按条件下推过滤
+    情绪、自信度两列在爬取时没有做情感分析时为null
+    """
+    schema = pa.schema([
+        ('CID', pa.string()),
+        ('用户名', pa.string()),
+        ('评论时间', pa.timestamp('s')),
+        ('评论地点', pa.string()),
+        ('评论内容', pa.string()),
+        ('评论点赞数', pa.int64()),
+        ('评论数量', pa.int64()),
+        ('情绪', pa.string()),
+        ('自信度', pa.float64()),
+    ]) if pa is not None else None
+
+    def __init__(self, row_group_size: int = 10000):
+        """
+        初始化
+        :param row_group_size: 每个row group的评论条数
+        """
+        if pa is None:
+            raise ImportError("ParquetStore需要安装pyarrow: pip install pyarrow")
+        self.file_path = "data/parquet"
+        self.row_group_size = row_group_size
+        self.flush_pages = max(1, row_group_size // 20)
+        self.buffers: Dict[str, Dict[str, List]] = {}
+
+    def make_file_path(self,aweme_id:str):
+        """
+        创建文件路径，每个视频一个目录
+        """
+        return f"{self.file_path}/{aweme_id}"
+
+    def load_cids(self,aweme_id:str) -> Set[str]:
+        """
+        读取已保存的评论cid，只读取CID一列
+        """
+        dir_name = self.make_file_path(aweme_id)
+        if not os.path.isdir(dir_name) or not os.listdir(dir_name):
+            return set()
+        return set(pq.read_table(dir_name, columns=['CID']).column('CID').to_pylist())
+
+    def save_data(self,save_item:CommentContainer,aweme_id:str):
+        """
+        保存数据，先写入缓冲区，攒够一个row group再写文件
+        :param save_item: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        self.save_many([save_item],aweme_id)
+
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据，按列追加到缓冲区，攒够一个row group再写文件
+        :param save_items: 保存的评论数据
+        :param aweme_id: 视频id
+        """
+        batch = CommentBatch.of(save_items)
+        buffer = self.buffers.setdefault(aweme_id, {name: [] for name in self.schema.names})
+        buffer['CID'].extend(batch.cid)
+        buffer['用户名'].extend(batch.user_name)
+        buffer['评论时间'].extend(batch.comment_time)
+        buffer['评论地点'].extend(batch.comment_ip)
+        buffer['评论内容'].extend(batch.comment_content)
+        buffer['评论点赞数'].extend(batch.likes)
+        buffer['评论数量'].extend(batch.reply_nums())
+        buffer['情绪'].extend(batch.emotion)
+        buffer['自信度'].extend(batch.confidence)
+        if len(buffer['CID']) >= self.row_group_size:
+            self.flush(aweme_id)
+
+    def flush(self,aweme_id:str):
+        """
+        将缓冲区写成一个新的parquet文件
+        """
+        buffer = self.buffers.pop(aweme_id, None)
+        if not buffer or not buffer['CID']:
+            return
+        dir_name = self.make_file_path(aweme_id)
+        pathlib.Path(dir_name).mkdir(parents=True, exist_ok=True)
+        table = pa.table({
+            name: pa.array(buffer[name]).cast(field.type) if name == '评论时间' else pa.array(buffer[name], field.type)
+            for name, field in zip(self.schema.names, self.schema)
+        }, schema=self.schema)
+        file_name = f"{dir_name}/part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.parquet"
+        pq.write_table(table, file_name, row_group_size=self.row_group_size)
+
+    def close(self):
+        """
+        写入所有视频剩余的缓冲数据
+        """
+        for aweme_id in list(self.buffers):
+            self.flush(aweme_id)
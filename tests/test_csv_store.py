@@ -0,0 +1,59 @@
+"""
+csv存储：情绪、自信度两列
+"""
+
+import csv
+import os
+import shutil
+
+import pytest
+
+from store import CsvStore
+from utility.data_container import CommentContainer
+from utility.data_loader import load_data
+
+
+AWEME_ID = "7441458537089338643"
+OLD_HEADERS = CsvStore.headers[:7]
+# 仓库自带的数据是没有情绪、自信度两列的旧文件
+OLD_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "csv", f"{AWEME_ID}.csv")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CsvStore()
+    store.file_path = str(tmp_path)
+    yield store
+    store.close()
+
+
+def read_rows(store: CsvStore):
+    with open(store.make_file_path(AWEME_ID), mode='r', newline='', encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+def test_old_file_gets_sentiment_columns(store):
+    shutil.copy(OLD_FILE, store.make_file_path(AWEME_ID))
+    old_rows = read_rows(store)
+    assert old_rows[0] == OLD_HEADERS
+
+    store.save_many([CommentContainer(cid="1", comment_content="好", emotion="积极", confidence=0.9)], AWEME_ID)
+    store.close()
+
+    rows = read_rows(store)
+    assert rows[0] == CsvStore.headers
+    assert rows[1:len(old_rows)] == [row + ['', ''] for row in old_rows[1:]]
+    assert rows[-1][0] == "1" and rows[-1][-2:] == ["积极", "0.9"]
+
+    df = load_data(store.make_file_path(AWEME_ID))
+    assert df.loc[1, '情绪'] == "积极"
+    assert df['情绪'].isna().sum() == len(df) - 1
+
+
+def test_old_file_without_sentiment_keeps_header(store):
+    shutil.copy(OLD_FILE, store.make_file_path(AWEME_ID))
+    store.save_many([CommentContainer(cid="1", comment_content="好")], AWEME_ID)
+    store.close()
+    rows = read_rows(store)
+    assert rows[0] == OLD_HEADERS
+    assert rows[-1][0] == "1" and len(rows[-1]) == len(OLD_HEADERS)
@@ -0,0 +1,21 @@
+"""
+评论数据载入：只读取部分列时与读取全部列的行相同
+"""
+
+import os
+
+import pytest
+
+from utility.data_loader import load_data
+
+
+CSV_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "csv", "7441458537089338643.csv")
+
+
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize("columns", [['省份'], ['评论时间'], ['省份', '评论点赞数'], ['评论内容']])
+def test_projection_keeps_rows(columns, fast):
+    full = load_data(CSV_FILE, fast=fast)
+    projected = load_data(CSV_FILE, columns=columns, fast=fast)
+    assert list(projected.columns) == columns
+    assert projected.index.equals(full.index)
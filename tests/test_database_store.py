@@ -0,0 +1,79 @@
+"""
+数据库存储：一批评论和回复在同一个事务中写入
+不需要MySQL，用记录调用的连接池代替aiomysql.Pool
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from store import DatabaseStore
+from utility.asyn_db import AsyncMysqlDB
+from utility.data_container import CommentContainer, ReplyContainer
+
+
+class FakeConnection:
+    def __init__(self, log, fail_table):
+        self.log = log
+        self.fail_table = fail_table
+
+    async def begin(self):
+        self.log.append(("begin", id(self)))
+
+    async def commit(self):
+        self.log.append(("commit", id(self)))
+
+    async def rollback(self):
+        self.log.append(("rollback", id(self)))
+
+    @asynccontextmanager
+    async def cursor(self):
+        connection = self
+
+        class Cursor:
+            async def executemany(self, sql, values):
+                table = sql.split()[2]
+                if table == connection.fail_table:
+                    raise RuntimeError(f"写入{table}失败")
+                connection.log.append((table, id(connection)))
+                return len(values)
+
+        yield Cursor()
+
+
+class FakePool:
+    def __init__(self, fail_table=None):
+        self.log = []
+        self.fail_table = fail_table
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self.log, self.fail_table)
+
+
+def write(pool) -> None:
+    store = DatabaseStore()
+    store.db = AsyncMysqlDB(pool)
+
+    async def init_db():
+        pass
+
+    store.init_db = init_db
+    comments = [CommentContainer(cid="1", comment_content="好", comment_time="2024-12-01 00:00:00",
+                                 comment_reply=[ReplyContainer(cid="11", reply_content="对")])]
+    asyncio.run(store.write(comments))
+
+
+def test_comments_and_replies_in_one_transaction():
+    pool = FakePool()
+    write(pool)
+    assert [event for event, _ in pool.log] == ["begin", "douyin_comment", "douyin_reply", "commit"]
+    assert len({connection for _, connection in pool.log}) == 1
+
+
+def test_failed_replies_roll_back_comments():
+    pool = FakePool(fail_table="douyin_reply")
+    with pytest.raises(RuntimeError):
+        write(pool)
+    assert [event for event, _ in pool.log] == ["begin", "douyin_comment", "rollback"]
@@ -0,0 +1,55 @@
+"""
+JSON Lines存储：爬取中途崩溃后续写
+"""
+
+import os
+
+import pytest
+
+from store import JsonLinesStore
+from utility.data_container import CommentContainer
+from utility.jsonl import iter_records
+
+
+AWEME_ID = "7400000000000000000"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonLinesStore()
+    store.file_path = str(tmp_path)
+    yield store
+    store.close()
+
+
+def save(store: JsonLinesStore, *cids: str) -> None:
+    store.save_many([CommentContainer(cid=cid, comment_content=f"评论{cid}") for cid in cids], AWEME_ID)
+    store.close()
+
+
+def read_cids(store: JsonLinesStore):
+    return [record["cid"] for record in iter_records(store.make_file_path(AWEME_ID))]
+
+
+def test_resume_after_torn_line(store):
+    save(store, "1", "2")
+    file_name = store.make_file_path(AWEME_ID)
+    # 模拟写到一半崩溃：最后一行只写了一部分
+    os.truncate(file_name, os.path.getsize(file_name) - 10)
+    save(store, "3")
+    assert read_cids(store) == ["1", "3"]
+
+
+def test_resume_after_missing_newline(store):
+    save(store, "1", "2")
+    file_name = store.make_file_path(AWEME_ID)
+    # 最后一条记录完整，只差换行符
+    os.truncate(file_name, os.path.getsize(file_name) - 1)
+    save(store, "3")
+    assert read_cids(store) == ["1", "2", "3"]
+
+
+def test_resume_after_clean_close(store):
+    save(store, "1")
+    save(store, "2")
+    assert read_cids(store) == ["1", "2"]
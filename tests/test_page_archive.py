@@ -0,0 +1,96 @@
+"""
+原始页面归档：爬取中途崩溃后续写，再重放
+"""
+
+import gzip
+import shutil
+
+import pytest
+
+from benchmarks.synthetic import make_comment_page
+from utility.page_archive import PageArchive
+
+
+AWEME_ID = "7400000000000000000"
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(PageArchive, "file_path", str(tmp_path))
+    return tmp_path
+
+
+def append_pages(archive: PageArchive, cursors) -> None:
+    for cursor in cursors:
+        archive.append("comment", make_comment_page(AWEME_ID, cursor, count=5), cursor)
+
+
+def crash_after_flush(cursors) -> None:
+    """
+    追加页面并flush后模拟进程被杀：文件停留在flush之后的状态，最后一个gzip成员没有结束
+    """
+    archive = PageArchive(AWEME_ID)
+    append_pages(archive, cursors)
+    archive.flush()
+    file_name = archive.make_file_path()
+    shutil.copy(file_name, f"{file_name}.crash")
+    archive.close()
+    shutil.move(f"{file_name}.crash", file_name)
+
+
+def replay_cids():
+    return [cid for batch in PageArchive.open_existing(AWEME_ID).replay() for cid in batch.cid]
+
+
+def expected_cids(cursors):
+    return [cid for cursor in cursors
+            for cid in (comment["cid"] for comment in make_comment_page(AWEME_ID, cursor, count=5)["comments"])]
+
+
+def test_resume_after_crash():
+    crash_after_flush([0, 5])
+    with PageArchive(AWEME_ID) as archive:
+        append_pages(archive, [10])
+    assert replay_cids() == expected_cids([0, 5, 10])
+
+
+def test_resume_twice_after_crash():
+    crash_after_flush([0])
+    crash_after_flush([5])
+    with PageArchive(AWEME_ID) as archive:
+        append_pages(archive, [10])
+    assert replay_cids() == expected_cids([0, 5, 10])
+
+
+def test_resume_after_close_keeps_file():
+    with PageArchive(AWEME_ID) as archive:
+        append_pages(archive, [0])
+    file_name = PageArchive(AWEME_ID).make_file_path()
+    with open(file_name, mode="rb") as file:
+        closed = file.read()
+    with PageArchive(AWEME_ID) as archive:
+        append_pages(archive, [5])
+    with open(file_name, mode="rb") as file:
+        assert file.read().startswith(closed)
+    assert replay_cids() == expected_cids([0, 5])
+
+
+def append_after_torn_member() -> None:
+    """
+    旧版本的续写方式：崩溃后直接在不完整的gzip成员之后追加新的成员
+    """
+    crash_after_flush([0, 5])
+    with open(PageArchive(AWEME_ID).make_file_path(), mode="ab") as file:
+        file.write(gzip.compress(b'{"kind": "comment"}\n'))
+
+
+def test_replay_stops_at_damaged_member():
+    append_after_torn_member()
+    assert replay_cids() == expected_cids([0, 5])
+
+
+def test_resume_repairs_damaged_file():
+    append_after_torn_member()
+    with PageArchive(AWEME_ID) as archive:
+        append_pages(archive, [10])
+    assert replay_cids() == expected_cids([0, 5, 10])
@@ -0,0 +1,91 @@
+"""
+从原始页面归档重放：同一个视频多次爬取后，每条评论和它的回复只输出一次
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from benchmarks.synthetic import make_comment, make_reply_page
+from store import JsonLinesStore
+from utility.crawl_pipeline import CrawlPipeline
+from utility.page_archive import PageArchive
+from utility.reply_pool import ReplyWorkerPool
+
+
+AWEME_ID = "7400000000000000000"
+PAGE_SIZE = 20
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(PageArchive, "file_path", str(tmp_path / "archive"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonLinesStore()
+    store.file_path = str(tmp_path / "jsonl")
+    yield store
+    store.close()
+
+
+def make_comments(start: int, count: int):
+    rng = random.Random(start)
+    return [make_comment(rng, AWEME_ID, index) for index in range(start, start + count)]
+
+
+def crawl(store, comments, incremental: bool = False) -> None:
+    """
+    用给定的评论列表(按接口的顺序，新评论在前)模拟一次爬取，回复页由make_reply_page生成
+    """
+    async def fetch(aweme_id, cursor):
+        end = min(cursor + PAGE_SIZE, len(comments))
+        return {"status_code": 0, "comments": comments[cursor:end], "cursor": end,
+                "has_more": 1 if end < len(comments) else 0}
+
+    async def request(aweme_id, cid, cursor):
+        return make_reply_page(aweme_id, cid, cursor)
+
+    async def main():
+        async with ReplyWorkerPool(workers=4, rate=1000) as pool:
+            pool.request = request
+            await CrawlPipeline(AWEME_ID, store, fetch=fetch, reply_pool=pool, incremental=incremental,
+                                archive=PageArchive(AWEME_ID)).run()
+        store.close()
+
+    asyncio.run(main())
+
+
+def replay():
+    batches = list(PageArchive.open_existing(AWEME_ID).replay())
+    cids = [cid for batch in batches for cid in batch.cid]
+    replies = {cid: [reply.cid for reply in comment_replies]
+               for batch in batches for cid, comment_replies in zip(batch.cid, batch.comment_reply)}
+    return cids, replies
+
+
+def expected_replies(comments):
+    return {comment["cid"]: [f"{comment['cid']}{i:03d}" for i in range(5)] if comment["reply_comment_total"] else []
+            for comment in comments}
+
+
+def test_replay_after_two_full_crawls(store):
+    comments = make_comments(0, 100)
+    crawl(store, comments)
+    crawl(store, comments)
+    cids, replies = replay()
+    assert sorted(cids) == sorted(comment["cid"] for comment in comments)
+    assert replies == expected_replies(comments)
+
+
+def test_replay_after_incremental_crawl(store):
+    comments = make_comments(0, 100)
+    crawl(store, comments)
+    # 新评论排在最前面，已有评论的游标整体偏移
+    updated = make_comments(1000, 5) + comments
+    crawl(store, updated, incremental=True)
+    cids, replies = replay()
+    assert sorted(cids) == sorted(comment["cid"] for comment in updated)
+    assert replies == expected_replies(updated)
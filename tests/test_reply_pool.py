@@ -0,0 +1,54 @@
+"""
+回复工作池：一个调用方被取消后，其它调用方仍能获取回复
+"""
+
+import asyncio
+
+from utility.data_container import CommentContainer, ReplyContainer
+from utility.reply_pool import ReplyWorkerPool
+
+
+def make_comments(prefix: str, count: int):
+    return [CommentContainer(cid=f"{prefix}{i}", reply_comment_total=1) for i in range(count)]
+
+
+async def fake_fetch_replies(aweme_id, cid, archive=None):
+    await asyncio.sleep(0.01)
+    return [ReplyContainer(cid=f"r{cid}")]
+
+
+def test_cancelled_caller_does_not_stop_workers():
+    async def main():
+        async with ReplyWorkerPool(workers=2, rate=1000) as pool:
+            pool.fetch_replies = fake_fetch_replies
+            # 第一个视频在等待回复时被取消，队列中还留有它的任务
+            first = asyncio.create_task(pool.attach_replies("1", make_comments("a", 6)))
+            await asyncio.sleep(0.015)
+            first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+
+            comments = make_comments("b", 4)
+            total = await asyncio.wait_for(pool.attach_replies("2", comments), timeout=5)
+            assert all(not task.done() for task in pool._tasks)
+            return total, comments
+
+    total, comments = asyncio.run(main())
+    assert total == 4
+    assert [comment.comment_reply[0].cid for comment in comments] == ["rb0", "rb1", "rb2", "rb3"]
+
+
+def test_failed_comment_gets_no_replies():
+    async def failing(aweme_id, cid, archive=None):
+        if cid == "a1":
+            raise RuntimeError("重试次数用尽")
+        return await fake_fetch_replies(aweme_id, cid)
+
+    async def main():
+        async with ReplyWorkerPool(workers=2, rate=1000) as pool:
+            pool.fetch_replies = failing
+            comments = make_comments("a", 3)
+            await asyncio.wait_for(pool.attach_replies("1", comments), timeout=5)
+            return comments
+
+    comments = asyncio.run(main())
+    assert [len(comment.comment_reply) for comment in comments] == [1, 0, 1]
@@ -0,0 +1,50 @@
+"""
+爬取时的情感分析：并发爬取多个视频时推理依次执行
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import types
+
+from benchmarks.synthetic import make_comment_page
+from store import JsonLinesStore
+from utility.crawl_pipeline import CrawlPipeline
+
+
+def test_pipelines_share_one_scoring_thread(tmp_path, monkeypatch):
+    lock = threading.Lock()
+    state = {"running": 0, "max_running": 0, "batches": 0}
+
+    def score_batch(batch):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+            state["batches"] += 1
+        batch.emotion = ["积极"] * len(batch)
+        batch.confidence = [0.9] * len(batch)
+        return batch
+
+    # 测试环境没有安装模型依赖，用计数的score_batch代替推理
+    monkeypatch.setitem(sys.modules, "utility.analyze_emo", types.SimpleNamespace(score_batch=score_batch))
+
+    async def fetch(aweme_id, cursor):
+        return make_comment_page(aweme_id, cursor, count=10, total=50)
+
+    store = JsonLinesStore()
+    store.file_path = str(tmp_path)
+
+    async def main():
+        await asyncio.gather(*(CrawlPipeline(aweme_id, store, fetch=fetch, sentiment=True).run()
+                               for aweme_id in ("1", "2", "3", "4")))
+
+    try:
+        asyncio.run(main())
+    finally:
+        store.close()
+    assert state["batches"] == 20
+    assert state["max_running"] == 1
@@ -4,7 +4,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import  List
+from typing import  Iterable, List, Set
 from utility.data_container import CommentContainer
 
 class AcquireParseClass(ABC):
@@ -23,6 +23,9 @@ class AbstractStore(ABC):
     """
     抽象存储类
     """
+    # 存储类在两次flush之间最多缓冲的页数，爬取管道每隔这么多页flush一次并推进断点
+    flush_pages: int = 1
+
     @abstractmethod
     def save_data(self,save_item:CommentContainer,aweme_id:str):
         """
@@ -32,3 +35,45 @@ class AbstractStore(ABC):
         """
         raise NotImplementedError("save_data方法未实现")
 
+    def save_many(self,save_items:Iterable[CommentContainer],aweme_id:str):
+        """
+        批量保存数据，默认逐条调用save_data，存储类可以重写为真正的批量写入
+        :param save_items: 保存的评论数据，评论容器列表或CommentBatch
+        :param aweme_id: 视频id
+        """
+        for save_item in save_items:
+            self.save_data(save_item,aweme_id)
+
+    def load_cids(self,aweme_id:str) -> Set[str]:
+        """
+        读取存储中已有的评论cid，用于增量爬取
+        :param aweme_id: 视频id
+        :return: cid集合，不支持的存储类返回空集合
+        """
+        return set()
+
+    def flush(self,aweme_id:str):
+        """
+        将缓冲的数据写入磁盘，返回后已保存的数据不会因崩溃丢失
+        :param aweme_id: 视频id
+        """
+        pass
+
+    def open(self):
+        """
+        打开存储需要的资源(文件句柄、连接等)
+        """
+        pass
+
+    def close(self):
+        """
+        写入缓冲的数据并释放资源
+        """
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,9 +1,14 @@
+import os
+
+import numpy as np
 import pandas as pd
 from tqdm import tqdm  # 进度条
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 from functools import lru_cache
-from multiprocessing import Pool
+from multiprocessing import get_context
+
+from utility.sentiment_cache import SentimentCache
 
 # 模型准备
 model_name = "uer/roberta-base-finetuned-jd-binary-chinese"
@@ -16,53 +21,219 @@ def load_model():
     model.to(device)
     return model
 
-def process_single(text):
-    model = load_model()
-    inputs = tokenizer(text, 
-                      padding=True, 
-                      truncation=True, 
-                      max_length=128, 
-                      return_tensors="pt").to(device)
-    outputs = model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    label = "积极" if probs.argmax() == 1 else "消极"
-    confidence = probs.max().item()
-    return (label, confidence)
-
-def local_sentiment_analysis(texts, batch_size=32) -> list:
-    """本地批量情感预测"""
-    model = load_model()  # 使用缓存模型
+# 推理后端：torch为PyTorch，onnx/onnx-int8为ONNX Runtime(见sentiment_onnx)
+# 默认后端可以用环境变量SENTIMENT_BACKEND设置
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "torch")
+# 推理进程数，大于1时分片到多个进程(见batch_process)
+DEFAULT_PROCESSES = int(os.environ.get("SENTIMENT_PROCESSES", "1"))
+# 子进程中不显示进度条，由主进程按分片显示
+SHOW_PROGRESS = True
+
+def to_result(pred) -> tuple:
+    """将一条评论的概率列表转换为(情绪, 自信度)"""
+    confidence = max(pred)
+    return ("积极" if pred.index(confidence) == 1 else "消极", confidence)
+
+def model_id(backend="torch") -> str:
+    """情感缓存使用的模型标识，不同后端的结果分开缓存"""
+    return model_name if backend == "torch" else f"{model_name}#{backend}"
+
+def forward(inputs, backend="torch") -> list:
+    """
+    对一批已分词、已填充的输入推理
+    :param inputs: 分词器返回的numpy数组
+    :return: 每条评论的概率列表
+    """
+    if backend == "torch":
+        model = load_model()  # 使用缓存模型
+        with torch.no_grad():
+            outputs = model(**{key: torch.from_numpy(value).to(device) for key, value in inputs.items()})
+            return torch.nn.functional.softmax(outputs.logits, dim=-1).tolist()
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}")
+    from utility import sentiment_onnx
+    return sentiment_onnx.forward(inputs, quantize=(backend == "onnx-int8"))
+
+def run_model(texts, batch_size=32, backend="torch") -> list:
+    """按原顺序分批推理"""
     # 批处理分割
     batches:list = [texts[i:i+batch_size] for i in range(0, len(texts), batch_size)]
   
     results = []
-    with torch.no_grad():
-        for batch in tqdm(batches, desc="情感推理"):
-            inputs = tokenizer(batch, 
-                             padding=True, 
-                             truncation=True, 
-                             max_length=128, 
-                             return_tensors="pt").to(device)
-            outputs = model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            labels = ["积极" if pred.argmax() == 1 else "消极" for pred in probs]
-            confidences = [max(pred.tolist()) for pred in probs]
-            results.extend(list(zip(labels, confidences)))
+    for batch in tqdm(batches, desc="情感推理", disable=not SHOW_PROGRESS):
+        inputs = tokenizer(batch, 
+                         padding=True, 
+                         truncation=True, 
+                         max_length=128, 
+                         return_tensors="np")
+        results.extend(to_result(pred) for pred in forward(inputs, backend))
   
     return results
 
-def batch_process(texts):
-    with Pool(4) as p:  # 使用4个进程
-        return p.map(process_single, texts)
+def make_length_batches(lengths, token_budget=4096, max_batch_size=256) -> list:
+    """
+    按token长度排序后切分批次，每批填充后的token数(批内最长长度 x 条数)不超过token_budget
+    长度相近的评论在同一批，短评论的批次条数多，长评论的批次条数少
+    :param lengths: 每条评论的token数
+    :return: 每批评论在原列表中的下标
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, batch = [], []
+    for index in order:
+        # 升序排列，加入的评论就是批内最长的
+        if batch and ((len(batch) + 1) * lengths[index] > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def run_model_bucketed(texts, token_budget=4096, backend="torch") -> list:
+    """
+    按token长度分桶推理，结果按原顺序返回
+    整体只分词一次，每批用tokenizer.pad填充到批内最长长度
+    """
+    encodings = tokenizer(texts, truncation=True, max_length=128)
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+
+    results = [None] * len(texts)
+    for batch in tqdm(make_length_batches(lengths, token_budget), desc="情感推理", disable=not SHOW_PROGRESS):
+        inputs = tokenizer.pad({key: [encodings[key][i] for i in batch] for key in encodings.keys()},
+                               return_tensors="np")
+        for index, pred in zip(batch, forward(inputs, backend)):
+            results[index] = to_result(pred)
+    return results
+
+def predict(texts, batch_size=32, token_budget=4096, backend="torch", processes=1) -> list:
+    """
+    情感推理
+    :param token_budget: 每批的token预算，为None时按batch_size固定条数、按原顺序分批
+    :param backend: 推理后端，见BACKENDS
+    :param processes: 推理进程数，大于1时用batch_process分片推理
+    """
+    if processes > 1 and len(texts) > processes * 64:
+        return batch_process(texts, processes, batch_size, token_budget, backend)
+    if token_budget:
+        return run_model_bucketed(texts, token_budget, backend)
+    return run_model(texts, batch_size, backend)
+
+def local_sentiment_analysis(texts, batch_size=32, use_cache=True, token_budget=4096, backend=None,
+                             processes=None, verbose=True) -> list:
+    """
+    本地批量情感预测
+    use_cache为True时先查SentimentCache，只有未命中的评论才交给模型，推理结果写回缓存
+    token_budget不为None时按长度分桶、按token预算分批(见run_model_bucketed)，否则每batch_size条一批
+    backend为onnx或onnx-int8时使用ONNX Runtime推理，模型在第一次使用时导出并缓存；为None时使用DEFAULT_BACKEND
+    processes为推理进程数，为None时使用DEFAULT_PROCESSES
+    verbose为False时不打印缓存命中情况(爬取时逐页调用)
+    """
+    texts = list(texts)
+    backend = backend or DEFAULT_BACKEND
+    processes = processes or DEFAULT_PROCESSES
+    if not use_cache:
+        return predict(texts, batch_size, token_budget, backend, processes)
+
+    with SentimentCache(model_id(backend)) as cache:
+        results = cache.get_many(texts)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if verbose:
+            print(f"情感缓存命中{len(texts) - len(misses)}/{len(texts)}条")
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            miss_results = predict(miss_texts, batch_size, token_budget, backend, processes)
+            cache.put_many(miss_texts, miss_results)
+            for i, result in zip(misses, miss_results):
+                results[i] = result
+    return results
+
+def init_worker(threads, backend):
+    """
+    推理进程初始化：限制本进程的计算线程数，并加载一次模型
+    """
+    global SHOW_PROGRESS
+    SHOW_PROGRESS = False
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    torch.set_num_threads(threads)
+    if backend == "torch":
+        load_model()
+    else:
+        from utility import sentiment_onnx
+        sentiment_onnx.intra_op_threads = threads
+        sentiment_onnx.load_session(backend == "onnx-int8")
+
+def predict_shard(task) -> list:
+    """推理一个分片，在子进程中执行"""
+    texts, batch_size, token_budget, backend = task
+    return predict(texts, batch_size, token_budget, backend)
+
+def batch_process(texts, processes=4, batch_size=32, token_budget=4096, backend="torch", shard_size=None) -> list:
+    """
+    多进程分片推理
+    1. 每个进程在初始化时加载一次模型，计算线程数为 CPU核数/进程数，避免线程超额订阅
+    2. 评论按原顺序切成连续的分片，每个分片在进程内照常分批推理
+    3. imap按分片顺序返回结果，拼接后与texts一一对应
+    :param processes: 进程数
+    :param shard_size: 每个分片的评论数，默认每个进程约4个分片
+    """
+    texts = list(texts)
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    shard_size = shard_size or max(256, -(-len(texts) // (processes * 4)))
+    tasks = [(texts[i:i + shard_size], batch_size, token_budget, backend)
+             for i in range(0, len(texts), shard_size)]
+
+    if backend != "torch":
+        # 先在主进程中导出模型，避免多个子进程同时导出
+        from utility import sentiment_onnx
+        sentiment_onnx.export_model(backend == "onnx-int8")
+
+    results = []
+    # spawn启动的子进程不继承父进程已初始化的torch线程池，避免fork后死锁
+    with get_context("spawn").Pool(processes, initializer=init_worker, initargs=(threads, backend)) as pool:
+        for shard_results in tqdm(pool.imap(predict_shard, tasks), total=len(tasks), desc=f"情感推理({processes}进程)"):
+            results.extend(shard_results)
+    return results
+
+def normalize_texts(texts: pd.Series) -> pd.Series:
+    """规范化评论内容：去掉首尾空白，连续空白合并为一个空格"""
+    return texts.fillna("").astype(str).str.strip().str.replace(r"\s+", " ", regex=True)
+
+def analyze_texts(texts, verbose=True) -> tuple:
+    """
+    对一组评论内容做情感分析
+    相同的评论内容(规范化后)只推理一次，结果按factorize得到的编码广播回每一条
+    :return: (情绪数组, 自信度数组, 去重率)
+    """
+    codes, uniques = pd.factorize(normalize_texts(pd.Series(texts, dtype=object)))
+    dedup_ratio = 1 - len(uniques) / len(codes) if len(codes) else 0.0
+    if verbose:
+        print(f"情感分析去重：{len(codes)}条评论中有{len(uniques)}条不同内容，去重率{dedup_ratio:.1%}")
+
+    sentiments = local_sentiment_analysis(uniques.tolist(), verbose=verbose) if len(uniques) else []
+    labels = np.array([s[0] for s in sentiments], dtype=object)
+    confidences = np.array([s[1] for s in sentiments], dtype=float)
+    return labels[codes], confidences[codes], dedup_ratio
+
+def score_batch(batch):
+    """
+    爬取时的情感分析阶段：为一页评论(CommentBatch)填充情绪、自信度两列，随评论一起写入存储
+    """
+    labels, confidences, _ = analyze_texts(batch.comment_content, verbose=False)
+    batch.emotion = labels.tolist()
+    batch.confidence = confidences.tolist()
+    return batch
 
 def get_emotion_df(df: pd.DataFrame) -> pd.DataFrame:
-    """获取情感分析结果的DataFrame"""
-    text_list = df["评论内容"].tolist()
-    sentiments = local_sentiment_analysis(text_list)
+    """
+    获取情感分析结果的DataFrame
+    相同的评论内容(规范化后)只推理一次，见analyze_texts
+    """
+    labels, confidences, dedup_ratio = analyze_texts(df["评论内容"])
     # 直接使用中文列名
-    return df.assign(
-        情绪=[s[0] for s in sentiments],
-        自信度=[s[1] for s in sentiments]
+    result = df.assign(
+        情绪=labels,
+        自信度=confidences
     )
-
-
+    result.attrs["去重率"] = dedup_ratio
+    return result
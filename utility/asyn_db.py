@@ -3,15 +3,144 @@
 # @Name    : 程序员阿江-Relakkes
 # @Time    : 2024/6/7 17:08
 # @Desc    :
+import asyncio
+import bisect
 import os
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
 from typing import Any, Dict, List, Optional, Union
 
 import aiomysql
 
 
+class PoolMetrics:
+    """
+    连接池指标
+    1. 获取连接的等待时间
+    2. 正在使用的连接数(当前值和峰值)
+    3. 按语句类型(SELECT/INSERT/UPDATE/...)统计的执行耗时直方图
+    """
+    # 直方图桶的上界(毫秒)，最后一个桶收集超过最大上界的耗时
+    buckets_ms = [1, 5, 10, 50, 100, 500, 1000, 5000]
+
+    def __init__(self):
+        self.acquire_count = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.query_count: Dict[str, int] = {}
+        self.query_total: Dict[str, float] = {}
+        self.query_histogram: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def statement_type(sql: str) -> str:
+        """
+        取sql的第一个关键字作为语句类型
+        """
+        words = sql.split(None, 1)
+        return words[0].upper() if words else "OTHER"
+
+    def record_acquire(self, wait: float):
+        """
+        记录一次获取连接
+        """
+        self.acquire_count += 1
+        self.acquire_wait_total += wait
+        self.acquire_wait_max = max(self.acquire_wait_max, wait)
+        self.in_use += 1
+        self.in_use_max = max(self.in_use_max, self.in_use)
+
+    def record_release(self):
+        """
+        记录一次归还连接
+        """
+        self.in_use -= 1
+
+    def record_query(self, sql: str, elapsed: float):
+        """
+        记录一条语句的执行耗时
+        """
+        kind = self.statement_type(sql)
+        histogram = self.query_histogram.setdefault(kind, [0] * (len(self.buckets_ms) + 1))
+        histogram[bisect.bisect_left(self.buckets_ms, elapsed * 1000)] += 1
+        self.query_count[kind] = self.query_count.get(kind, 0) + 1
+        self.query_total[kind] = self.query_total.get(kind, 0.0) + elapsed
+
+    @contextmanager
+    def timer(self, sql: str):
+        """
+        统计一条语句的执行耗时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_query(sql, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回当前指标，耗时单位为毫秒
+        """
+        labels = [f"<={bound}ms" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        return {
+            "acquire_count": self.acquire_count,
+            "acquire_wait_avg_ms": self.acquire_wait_total / self.acquire_count * 1000 if self.acquire_count else 0.0,
+            "acquire_wait_max_ms": self.acquire_wait_max * 1000,
+            "in_use": self.in_use,
+            "in_use_max": self.in_use_max,
+            "queries": {
+                kind: {
+                    "count": count,
+                    "avg_ms": self.query_total[kind] / count * 1000,
+                    "histogram": dict(zip(labels, self.query_histogram[kind])),
+                }
+                for kind, count in self.query_count.items()
+            },
+        }
+
+
 class AsyncMysqlDB:
     def __init__(self, pool: aiomysql.Pool) -> None:
         self.__pool = pool
+        self.metrics = PoolMetrics()
+
+    @asynccontextmanager
+    async def _acquire(self):
+        """
+        从连接池获取连接，并记录等待时间和正在使用的连接数
+        """
+        start = time.perf_counter()
+        async with self.__pool.acquire() as conn:
+            self.metrics.record_acquire(time.perf_counter() - start)
+            try:
+                yield conn
+            finally:
+                self.metrics.record_release()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        连接池状态和指标
+        """
+        return {
+            "size": self.__pool.size,
+            "freesize": self.__pool.freesize,
+            "minsize": self.__pool.minsize,
+            "maxsize": self.__pool.maxsize,
+            **self.metrics.snapshot(),
+        }
+
+    async def warmup(self, connections: int):
+        """
+        预先建立连接并执行一次ping，避免第一批请求承担建连耗时
+        :param connections: 预热的连接数
+        """
+        async def ping():
+            async with self._acquire() as conn:
+                await conn.ping()
+
+        await asyncio.gather(*(ping() for _ in range(min(connections, self.__pool.maxsize))))
 
     async def query(self, sql: str, *args: Union[str, int]) -> List[Dict[str, Any]]:
         """
@@ -20,10 +149,11 @@ class AsyncMysqlDB:
         :param args: sql中传递动态参数列表
         :return:
         """
-        async with self.__pool.acquire() as conn:
+        async with self._acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(sql, args)
-                data = await cur.fetchall()
+                with self.metrics.timer(sql):
+                    await cur.execute(sql, args)
+                    data = await cur.fetchall()
                 return data or []
 
     
@@ -34,10 +164,11 @@ class AsyncMysqlDB:
         :param args:sql中传递动态参数列表
         :return:
         """
-        async with self.__pool.acquire() as conn:
+        async with self._acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(sql, args)
-                data = await cur.fetchone()
+                with self.metrics.timer(sql):
+                    await cur.execute(sql, args)
+                    data = await cur.fetchone()
                 return data
 
     async def item_to_table(self, table_name: str, item: Dict[str, Any]) -> int:
@@ -53,17 +184,69 @@ class AsyncMysqlDB:
         fieldstr = ','.join(fields)
         valstr = ','.join(['%s'] * len(item))
         sql = "INSERT INTO %s (%s) VALUES(%s)" % (table_name, fieldstr, valstr)
-        async with self.__pool.acquire() as conn:
+        async with self._acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
                 try:
-                    await cur.execute(sql, values)
-                    await conn.commit()
+                    with self.metrics.timer(sql):
+                        await cur.execute(sql, values)
+                        await conn.commit()
                     lastrowid = cur.lastrowid
                     return lastrowid
                 except Exception as e:
                     await conn.rollback()
                     raise e
 
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        在一个连接上开启事务，正常退出时提交，出错时回滚
+        用法：
+            async with db.transaction() as cur:
+                await db.upsert_many("douyin_comment", comments, cur=cur)
+                await db.upsert_many("douyin_reply", replies, cur=cur)
+        """
+        async with self._acquire() as conn:
+            async with conn.cursor() as cur:
+                await conn.begin()
+                try:
+                    yield cur
+                    await conn.commit()
+                except BaseException:
+                    await conn.rollback()
+                    raise
+
+    async def upsert_many(self, table_name: str, items: List[Dict[str, Any]],
+                          update_fields: Optional[List[str]] = None, batch_size: int = 1000,
+                          cur: Optional[aiomysql.Cursor] = None) -> int:
+        """
+        批量插入或更新记录
+        使用 INSERT ... ON DUPLICATE KEY UPDATE + executemany，整批数据在同一个事务中提交
+        :param table_name: 表名
+        :param items: 记录列表，每条记录的字段必须相同
+        :param update_fields: 主键/唯一键冲突时需要更新的字段，默认更新全部字段
+        :param batch_size: 每次executemany发送的记录数
+        :param cur: transaction()返回的游标，在调用方的事务中写入；为None时单独开启一个事务
+        :return: 受影响的行数
+        """
+        if not items:
+            return 0
+        if cur is None:
+            async with self.transaction() as cur:
+                return await self.upsert_many(table_name, items, update_fields, batch_size, cur)
+        fields = list(items[0].keys())
+        update_fields = update_fields or fields
+        fieldstr = ','.join(f'`{field}`' for field in fields)
+        valstr = ','.join(['%s'] * len(fields))
+        updatestr = ','.join(f'`{field}`=VALUES(`{field}`)' for field in update_fields)
+        # aiomysql的executemany识别出 INSERT ... VALUES (%s,...) 时，把每次发送的记录改写为一条多行INSERT
+        sql = "INSERT INTO %s (%s) VALUES (%s) ON DUPLICATE KEY UPDATE %s" % (table_name, fieldstr, valstr, updatestr)
+        values = [[item[field] for field in fields] for item in items]
+        rows = 0
+        with self.metrics.timer(sql):
+            for i in range(0, len(values), batch_size):
+                rows += await cur.executemany(sql, values[i:i + batch_size])
+        return rows
+
     async def update_table(self, table_name: str, updates: Dict[str, Any], field_where: str,
                            value_where: Union[str, int, float]) -> int:
         """
@@ -86,9 +269,10 @@ class AsyncMysqlDB:
             upsets,
             field_where, value_where,
         )
-        async with self.__pool.acquire() as conn:
+        async with self._acquire() as conn:
             async with conn.cursor() as cur:
-                rows = await cur.execute(sql, values)
+                with self.metrics.timer(sql):
+                    rows = await cur.execute(sql, values)
                 return rows
 
     async def execute(self, sql: str, *args: Union[str, int]) -> int:
@@ -98,13 +282,18 @@ class AsyncMysqlDB:
         :param args:
         :return:
         """
-        async with self.__pool.acquire() as conn:
+        async with self._acquire() as conn:
             async with conn.cursor() as cur:
-                rows = await cur.execute(sql, args)
+                with self.metrics.timer(sql):
+                    rows = await cur.execute(sql, args)
                 return rows
 
 
 class MysqlConnect:
+    """
+    数据库连接单例
+    aiomysql的连接池只能在创建它的事件循环中使用，因此每个事件循环各有一个连接池
+    """
     _instance = None
 
     def __new__(cls, *args, **kwargs):
@@ -113,26 +302,59 @@ class MysqlConnect:
         return cls._instance
 
     def __init__(self):
-        self.db: Optional[AsyncMysqlDB] = None
+        # 单例每次MysqlConnect()都会调用__init__，不能重置已创建的连接池
+        if not hasattr(self, '_dbs'):
+            self._dbs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMysqlDB]" = weakref.WeakKeyDictionary()
+            self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    @property
+    def db(self) -> Optional[AsyncMysqlDB]:
+        """
+        当前事件循环的数据库对象
+        """
+        try:
+            return self._dbs.get(asyncio.get_running_loop())
+        except RuntimeError:
+            return None
 
     async def async_init(self):
-        if not hasattr(self, 'db') or self.db is None:
-            pool = await aiomysql.create_pool(
-                **self.mysql_conn_config,
-                autocommit=True,
-            )
-            self.db: AsyncMysqlDB = AsyncMysqlDB(pool)
+        loop = asyncio.get_running_loop()
+        lock = self._locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            if loop not in self._dbs:
+                config = self.mysql_conn_config
+                warmup = config.pop("warmup")
+                pool = await aiomysql.create_pool(
+                    **config,
+                    autocommit=True,
+                )
+                db = AsyncMysqlDB(pool)
+                if warmup > 0:
+                    await db.warmup(warmup)
+                self._dbs[loop] = db
         return self
 
     @property
-    def mysql_conn_config(self) -> Dict[str, str]:
+    def mysql_conn_config(self) -> Dict[str, Any]:
+        """
+        连接配置，均可通过环境变量修改
+        minsize/maxsize: 连接池最小/最大连接数
+        pool_recycle: 连接空闲超过该秒数后重建，-1表示不回收
+        connect_timeout: 建立连接的超时时间(秒)
+        warmup: 启动时预先建立并ping的连接数
+        """
         return {
             "host": os.getenv("MYSQL_HOST", "localhost"),
             "port": int(os.getenv("MYSQL_PORT", 3306)),
             "user": os.getenv("MYSQL_USER", "root"),
             "password": os.getenv("MYSQL_PASSWORD", "159357"),
             "db": os.getenv("MYSQL_DB", "visual_data"),
+            "minsize": int(os.getenv("MYSQL_POOL_MINSIZE", 1)),
+            "maxsize": int(os.getenv("MYSQL_POOL_MAXSIZE", 10)),
+            "pool_recycle": int(os.getenv("MYSQL_POOL_RECYCLE", 3600)),
+            "connect_timeout": int(os.getenv("MYSQL_CONNECT_TIMEOUT", 10)),
+            "warmup": int(os.getenv("MYSQL_POOL_WARMUP", 0)),
         }
 
     def get_db(self) -> AsyncMysqlDB:
-        return self.db
\ No newline at end of file
+        return self.db
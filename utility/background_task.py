@@ -0,0 +1,72 @@
+"""
+后台计算任务
+仪表盘启动时先展示计算快的图表，耗时的计算(情感推理、词云)放在后台线程中，
+页面用dcc.Interval轮询，结果就绪后再填充对应的面板
+"""
+
+import threading
+import traceback
+from typing import Any, Callable, Optional
+
+
+class BackgroundTask:
+    """
+    在后台线程中执行一次的计算
+    用法：
+        task = BackgroundTask("情感分析", get_emotion_comments, df)
+        task.start()
+        if task.done:
+            task.result  # 出错时为None，错误信息见task.error
+    """
+
+    def __init__(self, name: str, func: Callable, *args, **kwargs):
+        """
+        :param name: 任务名称，用于打印日志
+        :param func: 计算函数
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def start(self) -> "BackgroundTask":
+        """
+        启动后台线程，重复调用只启动一次
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待计算完成
+        :return: 是否已完成
+        """
+        return self._done.wait(timeout)
+
+    def _run(self):
+        print(f"后台任务[{self.name}]开始")
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+            print(f"后台任务[{self.name}]完成")
+        except Exception as e:
+            self.error = str(e)
+            print(f"后台任务[{self.name}]出错: {self.error}")
+            traceback.print_exc()
+        finally:
+            self._done.set()
@@ -0,0 +1,80 @@
+"""
+爬取断点
+每个视频一个json文件，记录下一页的游标和已经存储完成的页数
+只有在一页评论写入存储之后才推进断点，恢复时不会漏掉数据
+"""
+
+import json
+import os
+import pathlib
+import time
+
+
+class CrawlCheckpoint:
+    """
+    单个视频的爬取断点
+    """
+    file_path = "data/checkpoint"
+
+    def __init__(self, aweme_id: str, cursor: int = 0, pages: int = 0, finished: bool = False):
+        """
+        :param aweme_id: 视频id
+        :param cursor: 下一页的游标
+        :param pages: 已经存储完成的页数
+        :param finished: 是否已经爬取到最后一页
+        """
+        self.aweme_id = aweme_id
+        self.cursor = cursor
+        self.pages = pages
+        self.finished = finished
+
+    @classmethod
+    def make_file_path(cls, aweme_id: str) -> str:
+        """
+        创建文件路径
+        """
+        return f"{cls.file_path}/{aweme_id}.json"
+
+    @classmethod
+    def load(cls, aweme_id: str) -> "CrawlCheckpoint":
+        """
+        读取断点，不存在或已损坏时返回一个从头开始的断点
+        """
+        file_name = cls.make_file_path(aweme_id)
+        if os.path.exists(file_name):
+            with open(file_name, mode="r", encoding="utf-8") as file:
+                try:
+                    data = json.load(file)
+                    return cls(aweme_id, data["cursor"], data["pages"], data["finished"])
+                except (json.JSONDecodeError, KeyError):
+                    print(f"[{aweme_id}] 断点文件损坏，从头开始爬取")
+        return cls(aweme_id)
+
+    def advance(self, cursor: int, has_more: bool, pages: int = 1):
+        """
+        评论存储完成后推进断点并写入文件
+        :param cursor: 下一页的游标
+        :param has_more: 是否还有下一页
+        :param pages: 本次推进的页数
+        """
+        self.cursor = cursor
+        self.pages += pages
+        self.finished = not has_more
+        self.save()
+
+    def save(self):
+        """
+        写入文件，先写临时文件再替换，避免中途崩溃留下半个文件
+        """
+        file_name = self.make_file_path(self.aweme_id)
+        pathlib.Path(file_name).parent.mkdir(parents=True, exist_ok=True)
+        tmp_name = f"{file_name}.tmp"
+        with open(tmp_name, mode="w", encoding="utf-8") as file:
+            json.dump({
+                "aweme_id": self.aweme_id,
+                "cursor": self.cursor,
+                "pages": self.pages,
+                "finished": self.finished,
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }, file, ensure_ascii=False)
+        os.replace(tmp_name, file_name)
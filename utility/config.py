@@ -1,5 +1,11 @@
 class Config:
     GEOJSON_URL = "https://geojson.cn/api/china/china.json"
+    # 仓库中的省份GeoJSON，不是省级数据时从GEOJSON_URL下载一次并保存到GEOJSON_CACHE_PATH
+    GEOJSON_PATH = "assets/china_provinces.geojson"
+    GEOJSON_CACHE_PATH = "data/cache/geojson/china.json"
+    # 地图边界的简化容差(度)，可选的几个等级；0为不简化
+    GEOJSON_TOLERANCES = (0.0, 0.005, 0.01, 0.05)
+    GEOJSON_TOLERANCE = 0.01
     COLOR_SCALE = [
         [0.0, 'lightgray'],
         [0.00001, '#42f5b9'],
@@ -0,0 +1,232 @@
+"""
+流式爬取管道
+获取 -> 解析 -> (回复) -> 存储 各阶段同时运行，阶段之间用有界队列连接
+1. 每获取一页就立即解析并交给存储类，内存占用与视频评论总量无关
+2. 存储较慢时(如DatabaseStore)队列被填满，获取阶段随之阻塞，形成反压
+3. 中途失败时，已获取的页面都已经写入存储；配合断点可以从失败的位置继续
+4. 增量模式：遇到整页评论都已在存储中时停止翻页
+5. 传入PageArchive时，获取到的原始评论/回复页面写入压缩归档，之后可以离线重放
+6. 开启情感分析时，每页评论解析后立即推理情绪和自信度，与评论一起写入存储，仪表盘不需要再推理
+   同一进程中所有管道的推理都在同一个单线程的线程池中依次执行，
+   并发爬取多个视频时不会同时运行多个各自占满全部计算线程的推理，避免CPU超额订阅
+"""
+
+import asyncio
+import inspect
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import requests
+
+from utility.abstract_class import AbstractStore
+from utility.checkpoint import CrawlCheckpoint
+from utility.data_acquire_parse import AcquireParseComment
+from utility.data_container import CommentBatch
+from utility.page_archive import PageArchive
+from utility.reply_pool import ReplyWorkerPool
+
+
+# 队列结束标记
+_DONE = object()
+
+
+async def maybe_await(result: Any) -> Any:
+    """
+    兼容同步和异步的存储类方法
+    """
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def fetch_in_executor(aweme_id: str, cursor: int) -> Dict:
+    """
+    默认的获取函数：在线程池中执行阻塞的请求
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, AcquireParseComment.fetch_page, aweme_id, cursor)
+
+
+@lru_cache(maxsize=1)
+def get_sentiment_executor() -> ThreadPoolExecutor:
+    """
+    情感分析使用的线程池，只有一个线程，进程内所有管道共享
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment")
+
+
+class CrawlPipeline:
+    """
+    单个视频的流式爬取管道
+    队列中传递的是 (下一页游标, 是否还有下一页, 数据) 三元组，存储阶段据此推进断点
+    """
+    def __init__(self, aweme_id: str, store: AbstractStore, queue_size: int = 4,
+                 fetch: Optional[Callable[[str, int], Awaitable[Dict]]] = None,
+                 reply_pool: Optional[ReplyWorkerPool] = None,
+                 checkpoint: Optional[CrawlCheckpoint] = None, incremental: bool = False,
+                 archive: Optional[PageArchive] = None, max_retries: int = 5, sentiment: bool = False):
+        """
+        :param aweme_id: 视频id
+        :param store: 存储实例
+        :param queue_size: 阶段之间队列的最大长度(页数)
+        :param fetch: 获取一页数据的协程函数，默认为fetch_in_executor
+        :param reply_pool: 回复爬取工作池，为None时不获取回复
+        :param checkpoint: 爬取断点，为None时不记录断点、总是从头爬取
+        :param incremental: 增量模式，某一页的评论全部已在存储中时停止翻页
+        :param archive: 原始页面归档，为None时不归档；管道结束时关闭
+        :param max_retries: 单页评论最大重试次数
+        :param sentiment: 是否在解析后对每页评论做情感分析
+        """
+        self.aweme_id = aweme_id
+        self.store = store
+        self.queue_size = queue_size
+        self.fetch = fetch or fetch_in_executor
+        self.reply_pool = reply_pool
+        self.checkpoint = checkpoint
+        self.incremental = incremental
+        self.archive = archive
+        self.max_retries = max_retries
+        self.sentiment = sentiment
+        self.known_cids: Set[str] = set()
+        self.pages = 0
+        self.comments = 0
+
+    def is_known_page(self, data: Dict) -> bool:
+        """
+        判断一页评论是否全部已在存储中
+        """
+        comments = data.get('comments') or []
+        return bool(comments) and all(comment['cid'].strip() in self.known_cids for comment in comments)
+
+    async def fetch_page(self, cursor: int) -> Dict:
+        """
+        获取一页评论，请求失败或响应无法解析时按指数退避重试
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.fetch(self.aweme_id, cursor)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if attempt == self.max_retries:
+                    raise
+                print(f"[{self.aweme_id}] 游标{cursor}的评论请求失败，稍后重试: {e}")
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10) * random.uniform(0.5, 1.5))
+
+    async def fetch_stage(self, page_queue: asyncio.Queue, cursor: int):
+        """
+        获取阶段：按游标翻页，队列满时阻塞
+        """
+        while True:
+            data = await self.fetch_page(cursor)
+            if self.incremental and self.is_known_page(data):
+                print(f"[{self.aweme_id}] 本页评论均已存在，停止增量爬取")
+                await page_queue.put((cursor, False, None))
+                break
+            # 已存在的页不归档，重放时不会重复输出
+            if self.archive is not None:
+                self.archive.append("comment", data, cursor)
+            self.pages += 1
+            print(f"[{self.aweme_id}] 已获取第{self.pages}页评论数据")
+            has_more = bool(data.get('has_more', False))
+            cursor = data.get('cursor', cursor + 20)
+            await page_queue.put((cursor, has_more, data))
+            if not has_more:
+                break
+        await page_queue.put(_DONE)
+
+    async def parse_stage(self, page_queue: asyncio.Queue, comment_queue: asyncio.Queue):
+        """
+        解析阶段：每页解析为按列保存的CommentBatch，整列交给存储阶段
+        """
+        while (item := await page_queue.get()) is not _DONE:
+            cursor, has_more, data = item
+            comment_list = AcquireParseComment.parse_batch(data) if data is not None else None
+            await comment_queue.put((cursor, has_more, comment_list))
+        await comment_queue.put(_DONE)
+
+    async def sentiment_stage(self, comment_queue: asyncio.Queue, scored_queue: asyncio.Queue):
+        """
+        情感分析阶段：在共享的单线程线程池中推理每页评论的情绪，推理较慢时同样通过队列反压获取阶段
+        """
+        from utility.analyze_emo import score_batch
+
+        loop = asyncio.get_running_loop()
+        while (item := await comment_queue.get()) is not _DONE:
+            if item[2] is not None:
+                await loop.run_in_executor(get_sentiment_executor(), score_batch, item[2])
+            await scored_queue.put(item)
+        await scored_queue.put(_DONE)
+
+    async def reply_stage(self, comment_queue: asyncio.Queue, reply_queue: asyncio.Queue):
+        """
+        回复阶段：通过工作池为每页评论获取回复
+        """
+        while (item := await comment_queue.get()) is not _DONE:
+            if item[2] is not None:
+                await self.reply_pool.attach_replies(self.aweme_id, item[2], self.archive)
+            await reply_queue.put(item)
+        await reply_queue.put(_DONE)
+
+    async def store_stage(self, comment_queue: asyncio.Queue):
+        """
+        存储阶段：每保存store.flush_pages页评论，flush存储并推进断点
+        """
+        pending = 0
+        while (item := await comment_queue.get()) is not _DONE:
+            cursor, has_more, comment_list = item
+            if comment_list is not None:
+                await self.save_comments(comment_list)
+                pending += 1
+            if pending >= self.store.flush_pages or not has_more:
+                await maybe_await(self.store.flush(self.aweme_id))
+                if self.archive is not None:
+                    self.archive.flush()
+                if self.checkpoint is not None:
+                    self.checkpoint.advance(cursor, has_more, pending)
+                pending = 0
+
+    async def save_comments(self, comment_list: CommentBatch):
+        """
+        保存一页评论
+        """
+        await maybe_await(self.store.save_many(comment_list, self.aweme_id))
+        self.comments += len(comment_list)
+
+    async def run(self) -> int:
+        """
+        运行管道，任意阶段出错时取消其他阶段
+        :return: 爬取的页数
+        """
+        cursor = 0
+        if self.checkpoint is not None:
+            if self.checkpoint.finished:
+                self.checkpoint = CrawlCheckpoint(self.aweme_id)
+            elif self.checkpoint.pages > 0:
+                cursor = self.checkpoint.cursor
+                print(f"[{self.aweme_id}] 从断点恢复：已完成{self.checkpoint.pages}页，游标{cursor}")
+        if self.incremental:
+            self.known_cids = set(await maybe_await(self.store.load_cids(self.aweme_id)))
+            print(f"[{self.aweme_id}] 增量模式，存储中已有{len(self.known_cids)}条评论")
+
+        # 获取和存储之间的阶段，相邻阶段用一个队列连接
+        stages = [self.parse_stage]
+        if self.sentiment:
+            stages.append(self.sentiment_stage)
+        if self.reply_pool is not None:
+            stages.append(self.reply_stage)
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self.fetch_stage(queues[0], cursor))
+                for stage, in_queue, out_queue in zip(stages, queues, queues[1:]):
+                    group.create_task(stage(in_queue, out_queue))
+                group.create_task(self.store_stage(queues[-1]))
+        except ExceptionGroup as e:
+            # 只抛出第一个出错阶段的异常，其余阶段是被它取消的
+            raise e.exceptions[0]
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+        print(f"[{self.aweme_id}] 爬取完成，共{self.pages}页、{self.comments}条评论")
+        return self.pages
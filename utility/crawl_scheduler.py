@@ -0,0 +1,123 @@
+"""
+多视频并发爬取调度器
+1. 接收aweme_id或视频URL列表，同时爬取多个视频的评论
+2. 全局并发上限：同一时刻最多有max_concurrency个请求在进行
+3. 按host限速：同一个host的请求频率不超过host_rate次/秒
+4. 每个视频的原始页面写入各自的压缩归档
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from store import StoreFactory
+from utility.abstract_class import AbstractStore
+from utility.checkpoint import CrawlCheckpoint
+from utility.crawl_pipeline import CrawlPipeline
+from utility.data_acquire_parse import AcquireParseComment, COMMENT_API
+from utility.page_archive import PageArchive
+from utility.rate_limit import HostRateLimiter
+from utility.reply_pool import ReplyWorkerPool
+
+
+def parse_aweme_id(target: str) -> str:
+    """
+    从视频URL中提取aweme_id，传入的本身就是aweme_id时原样返回
+    :param target: 视频URL或aweme_id
+    :return: aweme_id
+    """
+    target = target.strip()
+    if "modal_id=" in target:
+        return target.split("modal_id=")[1].split("&")[0]
+    if "/video/" in target:
+        return target.split("/video/")[1].split("?")[0].split("/")[0]
+    return target
+
+
+class CrawlScheduler:
+    """
+    并发爬取调度器
+    每个视频一条CrawlPipeline；阻塞的requests请求放到线程池中执行
+    """
+    def __init__(self, store_type: str = "csv", max_concurrency: int = 8, host_rate: float = 5.0,
+                 queue_size: int = 4, reply_workers: int = 0, reply_rate: float = 5.0,
+                 resume: bool = True, incremental: bool = False, archive: Optional[str] = "gzip",
+                 sentiment: bool = False):
+        """
+        :param store_type: 存储类型，见StoreFactory
+        :param max_concurrency: 全局并发请求数上限
+        :param host_rate: 每个host每秒允许的请求数
+        :param queue_size: 每条管道阶段之间队列的最大长度
+        :param reply_workers: 回复爬取worker数量，为0时不获取回复
+        :param reply_rate: 所有视频合计每秒允许的回复请求数
+        :param resume: 是否从每个视频上次中断的断点继续
+        :param incremental: 增量模式，遇到整页评论都已在存储中时停止翻页
+        :param archive: 原始页面归档的压缩方式(gzip/zstd)，为None时不归档
+        :param sentiment: 是否在爬取时对评论做情感分析并保存结果
+        """
+        self.store_type = store_type
+        self.max_concurrency = max_concurrency
+        self.host_rate = host_rate
+        self.queue_size = queue_size
+        self.reply_workers = reply_workers
+        self.reply_rate = reply_rate
+        self.resume = resume
+        self.incremental = incremental
+        self.archive = archive
+        self.sentiment = sentiment
+        self._reply_pool: Optional[ReplyWorkerPool] = None
+
+    async def fetch(self, aweme_id: str, cursor: int) -> Dict:
+        """
+        受并发上限和host限速约束的获取函数
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            await self._limiter.wait(COMMENT_API)
+            return await loop.run_in_executor(self._executor, AcquireParseComment.fetch_page, aweme_id, cursor)
+
+    async def crawl(self, aweme_id: str, store: AbstractStore) -> int:
+        """
+        爬取单个视频的全部评论
+        :param aweme_id: 视频id
+        :param store: 存储实例
+        :return: 爬取的页数
+        """
+        checkpoint = CrawlCheckpoint.load(aweme_id) if self.resume else CrawlCheckpoint(aweme_id)
+        archive = PageArchive(aweme_id, self.archive) if self.archive else None
+        pipeline = CrawlPipeline(aweme_id, store, self.queue_size, fetch=self.fetch,
+                                 reply_pool=self._reply_pool, checkpoint=checkpoint,
+                                 incremental=self.incremental, archive=archive, sentiment=self.sentiment)
+        return await pipeline.run()
+
+    async def run(self, targets: Iterable[str]) -> Dict[str, int]:
+        """
+        并发爬取多个视频
+        :param targets: aweme_id或视频URL列表
+        :return: 每个视频爬取的页数，失败的视频记为-1
+        """
+        aweme_ids = list(dict.fromkeys(parse_aweme_id(target) for target in targets))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._limiter = HostRateLimiter(self.host_rate)
+        with StoreFactory.get_store(self.store_type) as store, \
+                ThreadPoolExecutor(max_workers=self.max_concurrency + self.reply_workers) as self._executor:
+            if self.reply_workers > 0:
+                self._reply_pool = ReplyWorkerPool(self.reply_workers, self.reply_rate, executor=self._executor)
+            try:
+                results = await asyncio.gather(
+                    *(self.crawl(aweme_id, store) for aweme_id in aweme_ids),
+                    return_exceptions=True
+                )
+            finally:
+                if self._reply_pool is not None:
+                    await self._reply_pool.close()
+
+        summary: Dict[str, int] = {}
+        for aweme_id, result in zip(aweme_ids, results):
+            if isinstance(result, Exception):
+                print(f"[{aweme_id}] 爬取失败: {result}")
+                summary[aweme_id] = -1
+            else:
+                summary[aweme_id] = result
+        print(f"爬取完成，成功{sum(1 for v in summary.values() if v >= 0)}/{len(summary)}个视频")
+        return summary
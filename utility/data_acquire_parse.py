@@ -2,20 +2,94 @@
 from abc import abstractmethod
 from datetime import datetime
 import json
+import os
 import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import requests
 
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
 from utility.abstract_class import AcquireParseClass
-from utility.data_container import CommentContainer, ReplyContainer
+from utility.data_container import CommentBatch, CommentContainer, ReplyContainer
+
+
+# 可以通过环境变量DOUYIN_API_HOST指向本地模拟接口(见benchmarks/mock_server.py)
+API_HOST = os.environ.get('DOUYIN_API_HOST', 'https://www-hj.douyin.com').rstrip('/')
+COMMENT_API = f'{API_HOST}/aweme/v1/web/comment/list/'
+REPLY_API = f'{API_HOST}/aweme/v1/web/comment/list/reply/'
+# 评论请求的超时时间(秒)，连接挂起时抛出异常由调用方重试，不会一直占用线程池中的线程
+COMMENT_TIMEOUT = 10
+
+
+def build_comment_params(aweme_id:str, cursor:int) -> Dict:
+    """
+    构造评论请求参数
+    每次请求都基于config_c.params复制一份，避免并发爬取时互相修改模块级参数
+    :param aweme_id: 视频id
+    :param cursor: 分页游标
+    :return: 请求参数
+    """
+    from utility.config_c import params
+
+    request_params = dict(params)
+    request_params['aweme_id'] = aweme_id
+    request_params['cursor'] = str(cursor)
+    return request_params
+
+
+def build_reply_params(aweme_id:str, cid:str, cursor:int) -> Dict:
+    """
+    构造回复请求参数
+    每次请求都基于config_r.params复制一份
+    :param aweme_id: 视频id
+    :param cid: 评论id
+    :param cursor: 分页游标
+    :return: 请求参数
+    """
+    from utility.config_r import params
+
+    request_params = dict(params)
+    request_params['item_id'] = aweme_id
+    request_params['comment_id'] = cid
+    request_params['cursor'] = str(cursor)
+    request_params['_signature'] = str(int(time.time() * 1000))
+    return request_params
 
 
 class AcquireParseComment(AcquireParseClass):
     """
     继承抽象类，用于获取评论数据，并解析评论数据
     """
+    @staticmethod
+    def fetch_page(aweme_id:str, cursor:int) -> Dict:
+        """
+        请求一页评论数据
+        不修改任何共享状态，可以在多个线程中同时调用
+        :param aweme_id: 视频id
+        :param cursor: 分页游标
+        :return: 该页的响应数据
+        :raises requests.exceptions.RequestException: 请求超时或状态码不是200，爬取流水线会退避重试
+        """
+        from utility.config_c import cookies,headers
+
+        response = requests.get(COMMENT_API,
+                                params=build_comment_params(aweme_id, cursor),
+                                cookies=cookies,
+                                headers=headers,
+                                timeout=COMMENT_TIMEOUT)
+
+        if response.status_code != 200:
+            # 请求头、cookies和URL中的msToken等参数是登录凭证，不打印
+            raise requests.exceptions.HTTPError(
+                f"请求失败，状态码：{response.status_code}，响应内容：{response.text[:200]}", response=response)
+
+        return loads(response.content)
+
     @abstractmethod
     def acquire_data(aweme_id:str) -> List:
         """
@@ -23,30 +97,11 @@ class AcquireParseComment(AcquireParseClass):
         :param aweme_id: 视频id
         :return: 评论数据
         """
-        from utility.config_c import params,cookies,headers
-
         response_list: List[Dict] = []
         cursor = 0
         while True:
             print(f"正在请求第{cursor}页评论数据")
-            params['aweme_id'] = aweme_id
-            params['cursor'] = str(cursor)
-            response = requests.get('https://www-hj.douyin.com/aweme/v1/web/comment/list/',params=params,cookies=cookies,headers=headers)
-        
-            if response.status_code != 200:
-                print(f"请求失败，状态码：{response.status_code}")
-                print(f"响应内容：{response.text}")
-                print(f"请求URL：{response.url}")
-                print(f"请求头：{response.request.headers}")
-                print(f"请求cookies：{response.request._cookies}")
-                print("完整请求信息：")
-                print(response.request.__dict__)
-                print("完整响应信息：")
-                print(response.__dict__)
-            else:
-                print("请求成功")
-            
-            data = response.json()
+            data = AcquireParseComment.fetch_page(aweme_id, cursor)
             response_list.append(data)
             if not data.get('has_more',False):
                 break
@@ -57,51 +112,94 @@ class AcquireParseComment(AcquireParseClass):
         return response_list
 
 
+    @staticmethod
+    def parse_columns(response:Dict) -> Dict[str, List]:
+        """
+        将一页评论解析为按列组织的数据
+        只读取用到的字段，每个字段一个列表，下标相同的元素属于同一条评论
+        :param response: 一页评论数据
+        :return: 列名到列数据的映射
+        """
+        comments = response.get('comments') or []
+        fromtimestamp = datetime.fromtimestamp
+        return {
+            'cid': [comment['cid'].strip() for comment in comments],
+            'user_name': [comment['user']['nickname'].strip() for comment in comments],
+            'comment_time': [fromtimestamp(comment['create_time']).strftime("%Y-%m-%d %H:%M:%S") for comment in comments],
+            'comment_ip': [comment.get('ip_label', '') for comment in comments],
+            'comment_content': [comment['text'].strip() for comment in comments],
+            'likes': [comment['digg_count'] for comment in comments],
+            'reply_comment_total': [comment.get('reply_comment_total', 0) for comment in comments],
+        }
+
+    @staticmethod
+    def parse_batch(response:Dict) -> CommentBatch:
+        """
+        将一页评论解析为CommentBatch，不逐条创建评论容器
+        :param response: 一页评论数据
+        :return: 按列保存的一页评论
+        """
+        return CommentBatch.from_columns(AcquireParseComment.parse_columns(response))
+
+    @staticmethod
+    def parse_page(response:Dict) -> List[CommentContainer]:
+        """
+        解析一页评论数据
+        :param response: 一页评论数据
+        :return: 评论数据容器列表
+        """
+        return list(AcquireParseComment.parse_batch(response))
+
     @abstractmethod
     def parse_data(response_list) -> List:
         """
         解析评论数据
-        :param response: 评论数据
+        :param response_list: 评论数据
         :return: 评论数据容器列表
         """
-
         print("开始解析评论数据")
         comment_list: List[CommentContainer] = []
-
         for response in response_list:
-            print(f"正在解析第{response_list.index(response)}页评论数据")
-            comments:Dict = response['comments']
-            for comment in comments:
-                comment_container = CommentContainer()
-                comment_container.cid = comment['cid'].strip()
-                comment_container.user_name = comment['user']['nickname'].strip()
-                comment_container.comment_time = datetime.fromtimestamp(comment['create_time']).strftime("%Y-%m-%d %H:%M:%S")
-                comment_container.comment_ip = comment['ip_label']
-                comment_container.comment_content = comment['text'].strip()
-                comment_container.likes = comment['digg_count']
-                comment_container.reply_comment_total = comment['reply_comment_total']
-        
-        return comment_list
+            comment_list.extend(AcquireParseComment.parse_page(response))
 
-                
-"""                 # 如果存在回复，则将回复数据添加到容器中
-                if comment['reply_comment_total'] > 0:
-                    reply_response_list = AcquireParseReply.acquire_data(comment['aweme_id'],comment['cid'])
-                    reply_list = AcquireParseReply.parse_data(reply_response_list)
-                    print(f"成功获取并解析{comment['cid']}共{len(reply_list)}条回复数据")
-                    comment_container.comment_reply = reply_list
-                # 将数据容器添加到列表中
-                comment_list.append(comment_container)
-
-        print(f"解析完成，共解析{len(comment_list)}条评论数据") """
-
-        
+        print(f"解析完成，共解析{len(response_list)}页、{len(comment_list)}条评论数据")
+        return comment_list
 
 
 class AcquireParseReply(AcquireParseClass):
     """
     继承抽象类，用于获取回复数据，并解析回复数据
     """
+    @staticmethod
+    def fetch_page(aweme_id:str, cid:str, cursor:int) -> Optional[Dict]:
+        """
+        请求一页回复数据
+        不修改任何共享状态，可以在多个线程中同时调用
+        :param aweme_id: 视频id
+        :param cid: 评论id
+        :param cursor: 分页游标
+        :return: 该页的响应数据，触发反爬或收到空响应时返回None，调用方应稍后重试
+        """
+        from utility.config_c import cookies,headers
+
+        response = requests.get(REPLY_API,
+                                params=build_reply_params(aweme_id, cid, cursor),
+                                cookies=cookies,
+                                headers=headers,
+                                timeout=3)
+
+        # 触发反爬
+        if response.headers.get('Bd-Ticket-Guard-Result') == '1205':
+            print("检测到反爬限制，等待重试...")
+            return None
+
+        # 空响应
+        if not response.text.strip():
+            print("收到空响应，尝试重试...")
+            return None
+
+        return loads(response.content)
+
     @abstractmethod
     def acquire_data(aweme_id:str,cid:str) -> List:
         """
@@ -109,43 +207,19 @@ class AcquireParseReply(AcquireParseClass):
         :param aweme_id: 视频id
         :return: 回复数据
         """
-        from utility.config_c import cookies,headers
-        from utility.config_r import params
         reply_response_list: List[Dict] = []
         cursor = 0
-        params['item_id'] = aweme_id
-        params['comment_id'] = cid
         
         while True:
             try:
-                params['cursor'] = str(cursor)
-                
                 # 增加随机延时
                 delay = random.uniform(1, 3)
                 time.sleep(delay)
                 
-                # 随机更新一些请求参数
-                params['_signature'] = str(int(time.time() * 1000))
-                
-                response = requests.get('https://www-hj.douyin.com/aweme/v1/web/comment/list/reply/',
-                                     params=params,
-                                     cookies=cookies,
-                                     headers=headers,
-                                     timeout=3)
-                
-                # 如果触发反爬，等待更长时间后重试
-                if 'Bd-Ticket-Guard-Result' in response.headers and response.headers['Bd-Ticket-Guard-Result'] == '1205':
-                    print("检测到反爬限制，等待重试...")
-                    time.sleep(3)  # 等待10秒后重试
+                data = AcquireParseReply.fetch_page(aweme_id, cid, cursor)
+                if data is None:
+                    time.sleep(1)
                     continue
-                    
-                # 检查响应内容是否为空
-                if not response.text.strip():
-                    print("收到空响应，尝试重试...")
-                    time.sleep(1)  # 等待5秒后重试
-                    continue
-                    
-                data = response.json()
                 if not data:
                     break
                     
@@ -1,51 +1,154 @@
 """
 1. 定义评论容器类和回复容器类
-2. 实现抽象类，用于获取数据和解析数据
+2. 定义按列保存一页评论的CommentBatch，解析和存储之间整列传递，不需要逐条创建对象
+容器类使用slots，不再为每个实例创建__dict__
 """
 
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
 
+@dataclass(slots=True)
 class ReplyContainer():
     """
     回复容器类
     包含回复发布者cid、reply_id、用户名、回复内容、点赞数量
     """
-    def __init__(self):
-        self.cid : str = ""
-        self.reply_id : str = ""
-        self.user_name : str = ""
-        self.reply_content : str = ""
-        self.likes : int = 0
+    cid: str = ""
+    reply_id: str = ""
+    user_name: str = ""
+    reply_content: str = ""
+    likes: int = 0
 
     def __str__(self) -> str:
         return f"""用户名: {self.user_name},
-回复内容: {self.reply_content}, 
+回复内容: {self.reply_content},
 点赞数量: {self.likes}"""
 
 
 
+@dataclass(slots=True)
 class CommentContainer():
     """
     评论容器类
-    包含评论发布者cid、用户名、评论发布时间、评论发布地点、评论内容、评论回复、点赞数量
+    包含评论发布者cid、用户名、评论发布时间、评论发布地点、评论内容、评论回复、点赞数量、回复总数、情绪、自信度
+    评论回复默认是共享的空元组，获取到回复时整体替换，没有回复的评论不再各自持有一个空列表
+    情绪和自信度只有在爬取时开启情感分析才有值，否则为None
     """
-    def __init__(self):
-        self.cid: str = "" 
-        self.user_name: str = ""
-        self.comment_time: str = ""
-        self.comment_ip: str = ""
-        self.comment_content: str = ""
-        self.comment_reply: List[ReplyContainer] = []
-        self.likes: int = 0
+    cid: str = ""
+    user_name: str = ""
+    comment_time: str = ""
+    comment_ip: str = ""
+    comment_content: str = ""
+    comment_reply: Sequence[ReplyContainer] = ()
+    likes: int = 0
+    reply_comment_total: int = 0
+    emotion: Optional[str] = None
+    confidence: Optional[float] = None
 
     def __str__(self) -> str:
-        return f"""用户名: {self.user_name}, 
-评论时间: {self.comment_time}, 
-评论地点: {self.comment_ip}, 
-评论内容: {self.comment_content}, 
-评论回复: 
-{'\n'.join(str(reply.user_name) + " : " + str(reply.reply_content) for reply in self.comment_reply)}, 
+        replies = '\n'.join(str(reply.user_name) + " : " + str(reply.reply_content) for reply in self.comment_reply)
+        return f"""用户名: {self.user_name},
+评论时间: {self.comment_time},
+评论地点: {self.comment_ip},
+评论内容: {self.comment_content},
+评论回复:
+{replies},
 点赞数量: {self.likes}"""
-    
 
+
+
+@dataclass(slots=True)
+class CommentBatch():
+    """
+    按列保存的一批评论
+    每个字段一个列表，下标相同的元素属于同一条评论；迭代时逐条生成CommentContainer，
+    因此只接受CommentContainer列表的代码也可以直接使用
+    情绪、自信度两列由爬取时的情感分析阶段填充(见analyze_emo.score_batch)，未分析时为None
+    """
+    cid: List[str] = field(default_factory=list)
+    user_name: List[str] = field(default_factory=list)
+    comment_time: List[str] = field(default_factory=list)
+    comment_ip: List[str] = field(default_factory=list)
+    comment_content: List[str] = field(default_factory=list)
+    likes: List[int] = field(default_factory=list)
+    reply_comment_total: List[int] = field(default_factory=list)
+    comment_reply: List[Sequence[ReplyContainer]] = field(default_factory=list)
+    emotion: List[Optional[str]] = field(default_factory=list)
+    confidence: List[Optional[float]] = field(default_factory=list)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List]) -> "CommentBatch":
+        """
+        由AcquireParseComment.parse_columns的结果创建，列表直接复用，不复制
+        """
+        return cls(
+            columns['cid'], columns['user_name'], columns['comment_time'], columns['comment_ip'],
+            columns['comment_content'], columns['likes'], columns['reply_comment_total'],
+            columns.get('comment_reply') or [()] * len(columns['cid']),
+            columns.get('emotion') or [None] * len(columns['cid']),
+            columns.get('confidence') or [None] * len(columns['cid']),
+        )
+
+    @classmethod
+    def of(cls, comments: Iterable[CommentContainer]) -> "CommentBatch":
+        """
+        将评论容器转换为CommentBatch，传入的本身就是CommentBatch时原样返回
+        """
+        if isinstance(comments, CommentBatch):
+            return comments
+        batch = cls()
+        for comment in comments:
+            batch.append(comment)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.cid)
+
+    def __iter__(self) -> Iterator[CommentContainer]:
+        for row in zip(self.cid, self.user_name, self.comment_time, self.comment_ip, self.comment_content,
+                       self.comment_reply, self.likes, self.reply_comment_total, self.emotion, self.confidence):
+            yield CommentContainer(*row)
+
+    def append(self, comment: CommentContainer):
+        """
+        追加一条评论
+        """
+        self.cid.append(comment.cid)
+        self.user_name.append(comment.user_name)
+        self.comment_time.append(comment.comment_time)
+        self.comment_ip.append(comment.comment_ip)
+        self.comment_content.append(comment.comment_content)
+        self.likes.append(comment.likes)
+        self.reply_comment_total.append(comment.reply_comment_total)
+        self.comment_reply.append(comment.comment_reply)
+        self.emotion.append(comment.emotion)
+        self.confidence.append(comment.confidence)
+
+    def extend(self, comments: Iterable[CommentContainer]):
+        """
+        追加一批评论，CommentBatch按列追加
+        """
+        other = CommentBatch.of(comments)
+        self.cid.extend(other.cid)
+        self.user_name.extend(other.user_name)
+        self.comment_time.extend(other.comment_time)
+        self.comment_ip.extend(other.comment_ip)
+        self.comment_content.extend(other.comment_content)
+        self.likes.extend(other.likes)
+        self.reply_comment_total.extend(other.reply_comment_total)
+        self.comment_reply.extend(other.comment_reply)
+        self.emotion.extend(other.emotion)
+        self.confidence.extend(other.confidence)
+
+    def reply_nums(self) -> List[int]:
+        """
+        每条评论已获取的回复数，对应存储中的'评论数量'列
+        """
+        return [len(replies) for replies in self.comment_reply]
+
+    def has_sentiment(self) -> bool:
+        """
+        是否已经过情感分析
+        """
+        return any(label is not None for label in self.emotion)
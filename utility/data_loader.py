@@ -1,35 +1,156 @@
+import os
+
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+from utility import sqlite_loader
+from utility.jsonl import iter_records
+from utility.province import normalize_provinces
+
+
+# JsonLinesStore记录字段与csv列名的对应关系
+JSONL_COLUMNS = {
+    'cid': 'CID',
+    'user_name': '用户名',
+    'comment_time': '评论时间',
+    'comment_ip': '评论地点',
+    'comment_content': '评论内容',
+    'likes': '评论点赞数',
+    'replies': '评论数量',
+    'emotion': '情绪',
+    'confidence': '自信度',
+}
+
+# 快速模式下csv各列的类型，重复值多的文本列使用category，评论时间按DATETIME_FORMAT解析
+CSV_DTYPES = {
+    'CID': 'int64',
+    '用户名': 'category',
+    '评论时间': 'datetime64[s]',
+    '评论地点': 'category',
+    '评论点赞数': 'int64',
+    '评论数量': 'int64',
+    '情绪': 'category',
+    '自信度': 'float64',
+}
+# 存储类写入的评论时间格式
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def read_jsonl(file_path, columns=None):
+    """
+    流式读取JsonLinesStore保存的文件，逐行转换为DataFrame的行，不会载入整个文件的json对象
+    回复只保留数量，作为'评论数量'列
+    """
+    fields = list(JSONL_COLUMNS)
+    if columns is not None:
+        fields = [field for field in fields if JSONL_COLUMNS[field] in columns]
+    rows = (
+        tuple(len(record.get(field) or []) if field == 'replies' else record.get(field) for field in fields)
+        for record in iter_records(file_path)
+    )
+    return pd.DataFrame.from_records(rows, columns=[JSONL_COLUMNS[field] for field in fields])
 
-def load_data(file_path):
-    df = pd.read_csv(file_path, index_col='CID')
+
+def read_csv_fast(file_path, columns=None):
+    """
+    快速读取csv：pyarrow多线程解析，各列直接解析为CSV_DTYPES指定的类型，不做类型推断
+    评论内容中可能有换行，需要开启newlines_in_values
+    :param columns: 只读取这些列，None为全部
+    """
+    arrow_types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'datetime64[s]': pa.timestamp('s'),
+    }
+    table = pa_csv.read_csv(
+        file_path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={column: arrow_types[column_type] for column, column_type in CSV_DTYPES.items()},
+            include_columns=columns,
+            timestamp_parsers=[DATETIME_FORMAT],
+            # 与pd.read_csv一致，空字符串读为缺失值
+            strings_can_be_null=True,
+        ),
+    )
+    # split_blocks、self_destruct：转换时逐列释放arrow内存，避免两份数据同时在内存中
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    df.set_index('CID', inplace=True)
+    return df
+
+
+def load_data(file_path, columns=None, filters=None, fast=True):
+    """
+    载入评论数据
+    :param file_path: csv文件、JsonLinesStore保存的jsonl文件、SqliteStore保存的db文件，
+                      或ParquetStore保存的parquet文件/目录
+    :param columns: 只读取这些列(CID总是作为索引读取)，可以用'省份'代替'评论地点'；db文件中没有的列会被忽略
+    :param filters: 仅parquet有效，下推到文件读取的过滤条件，
+                    如[('评论时间', '>=', pd.Timestamp('2024-12-01'))]
+    :param fast: csv使用快速模式(见read_csv_fast)，需要安装pyarrow；数据不符合CSV_DTYPES时自动退回普通模式
+    """
+    # 没有选择评论内容时也读取这一列，去掉空评论后再删除，保证与读取全部列时的行相同
+    drop_content = False
+    if columns is not None:
+        columns = ['CID'] + [('评论地点' if column == '省份' else column) for column in columns if column != 'CID']
+        if '评论内容' not in columns:
+            columns.append('评论内容')
+            drop_content = True
+
+    if file_path.endswith('.parquet') or os.path.isdir(file_path):
+        df = pd.read_parquet(file_path, columns=columns, filters=filters).set_index('CID')
+    elif file_path.endswith('.jsonl'):
+        df = read_jsonl(file_path, columns).set_index('CID')
+    elif file_path.endswith('.db'):
+        df = sqlite_loader.load_data(file_path, columns)
+    else:
+        df = None
+        if fast and pa is not None:
+            try:
+                df = read_csv_fast(file_path, columns)
+            except (pa.ArrowException, ValueError) as e:
+                print(f"快速模式读取失败，改用普通模式: {e}")
+        if df is None:
+            df = pd.read_csv(file_path, index_col='CID', usecols=columns)
+
+    # 去重和去掉空评论合并为一次take，没有需要去掉的行时不复制
+    keep = None
+    if df.index.has_duplicates:
+        keep = ~df.index.duplicated(keep='first')
+    if '评论内容' in df.columns and df['评论内容'].hasnans:
+        not_null = df['评论内容'].notna().to_numpy()
+        keep = not_null if keep is None else keep & not_null
+    if keep is not None:
+        df = df.take(np.flatnonzero(keep))
+    if drop_content:
+        df = df.drop(columns='评论内容')
     return (
-        df[~df.index.duplicated(keep='first')]
-        .dropna(subset=['评论内容'])
+        df
         .pipe(clean_location)  # 统一地理位置清洗
         .pipe(parse_datetime)  # 统一时间解析
-    ) 
+    )
 
 def clean_location(df):
-    """清洗地理位置数据"""
-    df = df.copy()
+    """清洗地理位置数据：评论地点按统一的映射表转换为省份categorical(见utility/province.py)，原地修改"""
     if '评论地点' in df.columns:
-        df = df.rename(columns={'评论地点': '省份'})  # 重命名列
-        df['省份'] = (
-            df['省份']
-            .str.replace('中国', '')
-            .str.strip()
-            .replace({
-                '内蒙古': '内蒙古',
-                '黑龙江': '黑龙江',
-                '香港': '香港'
-            })
-        )
+        df.rename(columns={'评论地点': '省份'}, inplace=True)  # 重命名列
+        df['省份'] = normalize_provinces(df['省份'])
     return df
 
 def parse_datetime(df):
-    """解析时间数据"""
-    df = df.copy()
-    if '评论时间' in df.columns:
-        df['评论时间'] = pd.to_datetime(df['评论时间'], errors='coerce')
-    return df 
\ No newline at end of file
+    """解析时间数据，按存储类写入的固定格式解析，格式不符时退回自动推断；原地修改"""
+    if '评论时间' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['评论时间']):
+        try:
+            df['评论时间'] = pd.to_datetime(df['评论时间'], format=DATETIME_FORMAT)
+        except (ValueError, TypeError):
+            df['评论时间'] = pd.to_datetime(df['评论时间'], errors='coerce')
+    return df
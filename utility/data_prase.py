@@ -4,6 +4,8 @@
 """
 import pandas as pd
 
+from utility.province import count_provinces
+
 
 def get_time_comments(df) -> pd.DataFrame:
     """
@@ -20,15 +22,9 @@ def get_time_comments(df) -> pd.DataFrame:
 def get_local_comments(df) -> pd.DataFrame:
     """
     提取评论地点与评论量的数据
+    省份名称与地图一致，无法映射的地点见返回值的attrs['未匹配地点']
     """
-    local_comments = df.groupby('省份').size().reset_index(name='评论数量')
-    local_comments['省份'] = local_comments['省份'].str.replace('中国', '').str.strip()
-    local_comments['省份'] = local_comments['省份'].replace({
-        '内蒙古': '内蒙古自治区',
-        '黑龙江': '黑龙江省',
-        '香港': '香港特别行政区'  # 保持与GeoJSON匹配
-    })
-    return local_comments
+    return count_provinces(df['省份'])
 
 
 def get_hot_comments(df) -> pd.DataFrame:
@@ -43,9 +39,17 @@ def get_hot_comments(df) -> pd.DataFrame:
 def get_emotion_comments(df) -> pd.DataFrame:
     """
     提取评论情绪与评论量的数据
+    爬取时已做过情感分析的评论(load_data读到了情绪、自信度列)直接使用保存的结果，只推理其余评论
     """
     from .analyze_emo import get_emotion_df
     try:
+        if '情绪' in df.columns and '自信度' in df.columns:
+            scored = df['情绪'].notna() & df['自信度'].notna()
+            print(f"{len(df)}条评论中{scored.sum()}条已在爬取时完成情感分析")
+            result = df.loc[scored, ['评论内容', '评论点赞数', '情绪', '自信度']]
+            if scored.all():
+                return result
+            return pd.concat([result, df.loc[~scored, ['评论内容', '评论点赞数']].pipe(get_emotion_df)])
         return df[['评论内容', '评论点赞数']].pipe(get_emotion_df) # 返回情绪分析后的数据
     except Exception as e:
         print(f"情绪分析出错: {str(e)}")
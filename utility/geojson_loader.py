@@ -0,0 +1,229 @@
+"""
+省份地图GeoJSON的读取与简化
+1. 每个进程只读取一次：优先使用仓库中的config.GEOJSON_PATH，其中不是省级数据时使用config.GEOJSON_CACHE_PATH，
+   本地缓存也没有时才从config.GEOJSON_URL下载一次并写入本地缓存，之后离线也可以使用
+2. 保持拓扑的简化：相邻省份共用的边界只简化一次，两侧得到完全相同的折线，简化后不会出现缝隙或重叠
+   - 连接点(三个及以上省份交汇处、共用边界的起止点)保持不动
+   - 多边形的环在连接点处切成弧段，每条弧段用Douglas-Peucker算法简化
+   - 同一条弧段无论在哪个省份中出现、方向如何，都按统一的方向简化，结果相同
+   容差的单位为经纬度，地图宽度约1000像素时每像素约0.06度，0.01度以下的简化肉眼不可见
+"""
+
+import json
+import os
+import pathlib
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from utility.config import config
+
+
+Point = Tuple[float, float]
+
+
+def is_province_level(geojson: Dict) -> bool:
+    """
+    是否为省级数据：省份地图需要每个省份一个要素
+    """
+    return len(geojson.get('features') or []) > 1
+
+
+def read_json(path: str) -> Dict:
+    with open(path, mode='r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+@lru_cache(maxsize=1)
+def load_raw_geojson() -> Dict:
+    """
+    读取未简化的省份GeoJSON，每个进程只读取一次
+    """
+    if os.path.exists(config.GEOJSON_PATH):
+        geojson = read_json(config.GEOJSON_PATH)
+        if is_province_level(geojson):
+            return geojson
+        print(f"{config.GEOJSON_PATH}不是省级数据，改用{config.GEOJSON_CACHE_PATH}")
+    if os.path.exists(config.GEOJSON_CACHE_PATH):
+        return read_json(config.GEOJSON_CACHE_PATH)
+
+    print(f"下载省份GeoJSON: {config.GEOJSON_URL}")
+    response = requests.get(config.GEOJSON_URL, timeout=30)
+    response.raise_for_status()
+    geojson = response.json()
+    pathlib.Path(config.GEOJSON_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{config.GEOJSON_CACHE_PATH}.tmp"
+    with open(tmp_path, mode='w', encoding='utf-8') as file:
+        json.dump(geojson, file, ensure_ascii=False)
+    os.replace(tmp_path, config.GEOJSON_CACHE_PATH)
+    return geojson
+
+
+@lru_cache(maxsize=8)
+def load_geojson(tolerance: float = 0.0) -> Dict:
+    """
+    读取省份GeoJSON，每个进程每个容差只读取/简化一次
+    返回的字典在调用者之间共享，不要修改
+    :param tolerance: 简化容差(度)，为0时不简化，可选值见config.GEOJSON_TOLERANCES
+    """
+    geojson = load_raw_geojson()
+    if tolerance <= 0:
+        return geojson
+    return simplify_geojson(geojson, tolerance)
+
+
+def iter_rings(geojson: Dict):
+    """
+    依次返回每个多边形的每个环(外环和内环)
+    """
+    for feature in geojson['features']:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            yield from geometry['coordinates']
+        elif geometry.get('type') == 'MultiPolygon':
+            for polygon in geometry['coordinates']:
+                yield from polygon
+
+
+def open_ring(ring: Sequence[Sequence[float]]) -> List[Point]:
+    """
+    去掉闭合环末尾重复的起点，只保留经纬度
+    """
+    points = [(point[0], point[1]) for point in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+def find_junctions(geojson: Dict) -> set:
+    """
+    查找连接点：同一个点在不同的环中(或同一环中多次)出现且前后相邻的点不同，
+    即共用边界的起止点和三个及以上多边形的交汇点
+    """
+    neighbors: Dict[Point, frozenset] = {}
+    junctions = set()
+    for ring in iter_rings(geojson):
+        points = open_ring(ring)
+        for i, point in enumerate(points):
+            pair = frozenset((points[i - 1], points[(i + 1) % len(points)]))
+            seen = neighbors.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float, keep_one: bool) -> List[int]:
+    """
+    Douglas-Peucker简化一条首尾不同的折线
+    :param keep_one: 至少保留一个中间点(距离首尾连线最远的点)，保证由两条弧段组成的环不会退化
+    :return: 保留的点的下标，包含首尾
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    force = keep_one
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[start + 1:end]
+        direction = points[end] - points[start]
+        length = np.hypot(*direction)
+        offset = segment - points[start]
+        if length == 0:
+            distances = np.hypot(offset[:, 0], offset[:, 1])
+        else:
+            distances = np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+        index = int(distances.argmax())
+        if distances[index] > tolerance or force:
+            force = False
+            keep[start + 1 + index] = True
+            stack.append((start, start + 1 + index))
+            stack.append((start + 1 + index, end))
+    return np.flatnonzero(keep).tolist()
+
+
+def simplify_arc(arc: Tuple[Point, ...], tolerance: float) -> List[Point]:
+    """
+    简化一条弧段，首尾不动
+    首尾相同(没有连接点的环)时先在离起点最远的点处分成两段，每段至少保留一个中间点
+    """
+    points = np.asarray(arc, dtype=float)
+    if len(points) <= 2:
+        return list(arc)
+    if arc[0] != arc[-1]:
+        return [arc[i] for i in douglas_peucker(points, tolerance, keep_one=True)]
+    offset = points - points[0]
+    split = int(np.hypot(offset[:, 0], offset[:, 1]).argmax())
+    first = douglas_peucker(points[:split + 1], tolerance, keep_one=True)
+    second = douglas_peucker(points[split:], tolerance, keep_one=True)
+    return [arc[i] for i in first] + [arc[split + i] for i in second[1:]]
+
+
+def split_ring(points: List[Point], junctions: set) -> List[Tuple[Point, ...]]:
+    """
+    在连接点处把环切成首尾相接的弧段
+    没有连接点的环(岛屿或与另一个环完全重合的环)从坐标最小的点切开，重合的环切点相同
+    """
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+    if not cuts:
+        cuts = [points.index(min(points))]
+    arcs = []
+    for start, end in zip(cuts, cuts[1:] + [cuts[0] + len(points)]):
+        arcs.append(tuple(points[i % len(points)] for i in range(start, end + 1)))
+    return arcs
+
+
+def simplify_geojson(geojson: Dict, tolerance: float) -> Dict:
+    """
+    保持拓扑地简化GeoJSON，返回新的字典，properties原样保留
+    :param geojson: 省份GeoJSON
+    :param tolerance: 简化容差(度)
+    """
+    junctions = find_junctions(geojson)
+    # 按统一方向简化过的弧段，相邻省份共用的弧段只简化一次
+    simplified: Dict[Tuple[Point, ...], List[Point]] = {}
+
+    def simplify_ring(ring):
+        points = open_ring(ring)
+        if len(points) < 3:
+            return ring
+        result = []
+        for arc in split_ring(points, junctions):
+            reverse = arc[::-1]
+            if reverse < arc:
+                arc_points = simplified.get(reverse)
+                if arc_points is None:
+                    arc_points = simplified[reverse] = simplify_arc(reverse, tolerance)
+                arc_points = arc_points[::-1]
+            else:
+                arc_points = simplified.get(arc)
+                if arc_points is None:
+                    arc_points = simplified[arc] = simplify_arc(arc, tolerance)
+            result.extend(arc_points if not result else arc_points[1:])
+        return [list(point) for point in result]
+
+    def simplify_geometry(geometry):
+        if not geometry:
+            return geometry
+        if geometry['type'] == 'Polygon':
+            return {**geometry, 'coordinates': [simplify_ring(ring) for ring in geometry['coordinates']]}
+        if geometry['type'] == 'MultiPolygon':
+            return {**geometry, 'coordinates': [[simplify_ring(ring) for ring in polygon]
+                                                for polygon in geometry['coordinates']]}
+        return geometry
+
+    return {
+        **geojson,
+        'features': [{**feature, 'geometry': simplify_geometry(feature.get('geometry'))}
+                     for feature in geojson['features']]
+    }
+
+
+def count_points(geojson: Dict) -> int:
+    """
+    统计坐标点数
+    """
+    return sum(len(ring) for ring in iter_rings(geojson))
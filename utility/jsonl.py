@@ -0,0 +1,64 @@
+"""
+JSON Lines文件工具
+每行一条评论记录，回复嵌套在记录的replies字段中
+"""
+
+import json
+import os
+from typing import Dict, Iterator
+
+
+def iter_records(file_path: str) -> Iterator[Dict]:
+    """
+    逐行读取JSON Lines文件，不会一次性载入整个文件
+    末尾写了一半的行(爬取中途崩溃)会被跳过
+    :param file_path: 文件路径
+    :return: 记录迭代器
+    """
+    with open(file_path, mode="r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"跳过无法解析的行: {line[:50]}")
+
+
+
+def repair_tail(file_path: str, chunk_size: int = 64 * 1024) -> None:
+    """
+    修复崩溃留下的没有换行符的最后一行，之后才能以追加模式续写，否则新记录会接在这一行后面而无法读取
+    最后一行是完整的记录时补上换行符，否则截断到上一个换行符
+    :param file_path: 文件路径
+    :param chunk_size: 从文件末尾向前查找换行符时每次读取的字节数
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, mode="rb+") as file:
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b"\n":
+            return
+        # 从末尾向前查找最后一个换行符
+        start = end
+        tail = b""
+        while start > 0:
+            start = max(0, start - chunk_size)
+            file.seek(start)
+            tail = file.read(end - start)
+            position = tail.rfind(b"\n")
+            if position >= 0:
+                start += position + 1
+                tail = tail[position + 1:]
+                break
+        try:
+            json.loads(tail)
+        except ValueError:
+            print(f"{file_path}末尾有不完整的行(上次写入中断)，已截断{len(tail)}字节")
+            file.truncate(start)
+        else:
+            file.write(b"\n")
@@ -0,0 +1,308 @@
+"""
+原始接口页面归档
+1. 爬取时把每一页评论/回复的原始响应追加写入压缩的JSON Lines文件，每个视频一个文件
+2. 修改解析或存储逻辑后，可以从归档重放，不需要重新请求接口
+   同一个视频多次爬取(全量重爬、断点续爬时重新获取的页、增量爬取)都追加到同一个文件，
+   重放时每条评论只使用最后一次出现的记录，每条评论的回复只使用最后一次获取的回复页
+默认使用gzip，安装zstandard后可以选择zstd；每次flush结束一个压缩块/帧，
+崩溃时最多丢失最后一次flush之后的数据
+崩溃后文件末尾是一个没有结束的gzip成员/zstd帧，直接在后面追加会使之后的数据都无法解压，
+所以续写前先把文件截断到最后一个完整的成员/帧，再把不完整部分中可以读出的记录重新写入
+"""
+
+import gzip
+import os
+import pathlib
+import zlib
+from collections import defaultdict, deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from orjson import dumps, loads
+except ImportError:
+    import json
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    loads = json.loads
+
+from utility.data_acquire_parse import AcquireParseComment, AcquireParseReply
+from utility.data_container import CommentBatch
+
+
+class PageArchive:
+    """
+    单个视频的原始页面归档
+    每行一条记录：{"kind": "comment"|"reply", "cursor": 游标, "cid": 评论id(回复页), "page": 原始响应}
+    """
+    file_path = "data/archive"
+    extensions = {"gzip": "jsonl.gz", "zstd": "jsonl.zst"}
+    chunk_size = 1024 * 1024
+    zstd_errors = (zstandard.ZstdError,) if zstandard else ()
+
+    def __init__(self, aweme_id: str, compression: str = "gzip"):
+        """
+        :param aweme_id: 视频id
+        :param compression: 压缩方式，gzip或zstd
+        """
+        if compression not in self.extensions:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd压缩需要安装zstandard: pip install zstandard")
+        self.aweme_id = aweme_id
+        self.compression = compression
+        self.file = None
+        self.writer = None
+
+    @classmethod
+    def open_existing(cls, aweme_id: str) -> "PageArchive":
+        """
+        按已存在的归档文件确定压缩方式
+        """
+        for compression, extension in cls.extensions.items():
+            if os.path.exists(f"{cls.file_path}/{aweme_id}.{extension}"):
+                return cls(aweme_id, compression)
+        raise FileNotFoundError(f"视频{aweme_id}没有归档文件")
+
+    def make_file_path(self) -> str:
+        """
+        创建文件路径
+        """
+        return f"{self.file_path}/{self.aweme_id}.{self.extensions[self.compression]}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def make_decompressor(self):
+        """
+        创建解压单个gzip成员/zstd帧的解压对象
+        """
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(wbits=31)
+
+    def find_torn_tail(self, file_name: str) -> int:
+        """
+        查找崩溃留下的不完整尾部
+        :return: 最后一个完整的gzip成员/zstd帧结束的字节位置，等于文件大小时没有不完整的尾部
+        """
+        end = 0
+        offset = 0
+        decompressor = self.make_decompressor()
+        with open(file_name, mode="rb") as file:
+            while True:
+                data = file.read(self.chunk_size)
+                if not data:
+                    break
+                offset += len(data)
+                while data:
+                    try:
+                        decompressor.decompress(data)
+                    except (zlib.error, *self.zstd_errors):
+                        # 损坏的数据之后无法解压，从这里截断
+                        return end
+                    if not decompressor.eof:
+                        break
+                    # 一个成员/帧结束，剩下的数据属于下一个成员/帧
+                    data = decompressor.unused_data
+                    end = offset - len(data)
+                    decompressor = self.make_decompressor()
+        return end
+
+    def decompress(self, decompressor, data: bytes) -> Tuple[bytes, bool]:
+        """
+        解压一段数据
+        遇到损坏的数据时(gzip)二分查找损坏的位置，返回损坏处之前可以解压出的数据
+        :return: 解压出的数据，是否遇到损坏的数据
+        """
+        # 出错后解压对象的状态不可用，先保留一份副本(zstd的解压对象不支持复制)
+        backup = decompressor.copy() if hasattr(decompressor, "copy") else None
+        try:
+            return decompressor.decompress(data), False
+        except (zlib.error, *self.zstd_errors):
+            if backup is None:
+                return b"", True
+        decompressor = backup
+        output = []
+        while len(data) > 1:
+            half = len(data) // 2
+            trial = decompressor.copy()
+            try:
+                output.append(trial.decompress(data[:half]))
+            except zlib.error:
+                data = data[:half]
+                continue
+            decompressor = trial
+            data = data[half:]
+        return b"".join(output), True
+
+    def iter_decompressed(self, file_name: str, start: int = 0) -> Iterator[bytes]:
+        """
+        从start处开始逐个成员/帧解压，在数据结束或损坏处停止
+        :param start: 开始解压的字节位置，必须是一个成员/帧的开头
+        """
+        decompressor = self.make_decompressor()
+        with open(file_name, mode="rb") as file:
+            file.seek(start)
+            for data in iter(lambda: file.read(self.chunk_size), b""):
+                while data:
+                    chunk, damaged = self.decompress(decompressor, data)
+                    yield chunk
+                    if damaged:
+                        print(f"[{self.aweme_id}] 归档文件已损坏，之后的数据已忽略")
+                        return
+                    if not decompressor.eof:
+                        break
+                    data = decompressor.unused_data
+                    decompressor = self.make_decompressor()
+
+    def read_torn_lines(self, file_name: str, start: int) -> List[bytes]:
+        """
+        从不完整的尾部中解压出完整的行，直到数据结束或损坏处
+        :param start: 不完整尾部的字节位置
+        """
+        return b"".join(self.iter_decompressed(file_name, start)).split(b"\n")[:-1]
+
+    def open_writer(self):
+        """
+        以追加模式打开压缩流
+        文件末尾有崩溃留下的不完整成员/帧时，先截断到最后一个完整的成员/帧，再重新写入其中可以读出的记录
+        """
+        file_name = self.make_file_path()
+        pathlib.Path(file_name).parent.mkdir(parents=True, exist_ok=True)
+        lines: List[bytes] = []
+        if os.path.exists(file_name):
+            end = self.find_torn_tail(file_name)
+            size = os.path.getsize(file_name)
+            if end < size:
+                lines = self.read_torn_lines(file_name, end)
+                print(f"[{self.aweme_id}] 归档文件末尾不完整(上次爬取中断)，截断{size - end}字节，"
+                      f"重新写入其中的{len(lines)}条记录")
+                os.truncate(file_name, end)
+        self.file = open(file_name, mode="ab")
+        if self.compression == "zstd":
+            self.writer = zstandard.ZstdCompressor().stream_writer(self.file, closefd=False)
+        else:
+            self.writer = gzip.GzipFile(fileobj=self.file, mode="ab")
+        if lines:
+            self.writer.write(b"".join(line + b"\n" for line in lines))
+            self.flush()
+
+    def append(self, kind: str, page: Dict, cursor: int, cid: Optional[str] = None):
+        """
+        追加一页原始响应
+        :param kind: comment或reply
+        :param page: 原始响应
+        :param cursor: 请求该页使用的游标
+        :param cid: 回复页对应的评论id
+        """
+        if self.writer is None:
+            self.open_writer()
+        self.writer.write(dumps({"kind": kind, "cursor": cursor, "cid": cid, "page": page}) + b"\n")
+
+    def flush(self):
+        """
+        结束当前压缩块/帧并写入磁盘
+        """
+        if self.writer is None:
+            return
+        if self.compression == "zstd":
+            self.writer.flush(zstandard.FLUSH_FRAME)
+        else:
+            self.writer.flush(zlib.Z_SYNC_FLUSH)
+        self.file.flush()
+
+    def close(self):
+        """
+        关闭文件
+        """
+        if self.writer is None:
+            return
+        self.flush()
+        self.writer.close()
+        self.file.close()
+        self.writer = None
+        self.file = None
+
+    def iter_records(self) -> Iterator[Dict]:
+        """
+        逐条读取归档记录，文件末尾不完整或损坏的数据会被忽略
+        """
+        file_name = self.make_file_path()
+        if not os.path.exists(file_name):
+            return
+        # 按块解压再切分行：解压到文件截断或损坏处时，之前完整的行仍然可以读出
+        buffer = b""
+        for chunk in self.iter_decompressed(file_name):
+            lines = (buffer + chunk).split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                if line:
+                    yield loads(line)
+        if buffer:
+            print(f"[{self.aweme_id}] 归档文件末尾不完整，已忽略")
+
+    def iter_pages(self, kind: str = "comment") -> Iterator[Dict]:
+        """
+        按写入顺序读取某一类原始页面
+        """
+        for record in self.iter_records():
+            if record["kind"] == kind:
+                yield record["page"]
+
+    def replay(self, with_replies: bool = True) -> Iterator[CommentBatch]:
+        """
+        从归档重放：每页评论用AcquireParseComment解析，回复页按评论id分组后用AcquireParseReply解析
+        多次爬取留下的重复数据：评论按cid只保留最后一次出现的记录(新评论会使游标偏移，不能按游标去重)；
+        回复按评论id只保留最后一次获取的回复页，即最后一个游标为0的回复页及之后的回复页
+        读取两遍归档：第一遍只记录位置，第二遍逐页解析，
+        一页评论等到它的回复页都读到后就输出，只缓存尚未输出的评论对应的回复页
+        :param with_replies: 是否还原评论的回复
+        :return: 每页评论的CommentBatch，只包含在该页最后一次出现的评论
+        """
+        # 每条评论最后出现的位置，每条评论最后一次获取回复的起止位置
+        comment_last: Dict[str, int] = {}
+        reply_start: Dict[str, int] = {}
+        reply_end: Dict[str, int] = {}
+        for position, record in enumerate(self.iter_records()):
+            if record["kind"] == "comment":
+                for comment in record["page"].get("comments") or []:
+                    comment_last[comment["cid"].strip()] = position
+            elif with_replies and record["kind"] == "reply":
+                if record["cursor"] == 0 or record["cid"] not in reply_start:
+                    reply_start[record["cid"]] = position
+                reply_end[record["cid"]] = position
+
+        reply_pages: Dict[str, List[Dict]] = defaultdict(list)
+        # 等待回复页的评论页：(CommentBatch, 回复页都读到时的位置)
+        pending = deque()
+
+        def attach(batch: CommentBatch) -> CommentBatch:
+            for index, cid in enumerate(batch.cid):
+                pages = reply_pages.pop(cid, None)
+                if pages:
+                    batch.comment_reply[index] = AcquireParseReply.parse_data(pages)
+            return batch
+
+        for position, record in enumerate(self.iter_records()):
+            if record["kind"] == "comment":
+                comments = [comment for comment in record["page"].get("comments") or []
+                            if comment_last[comment["cid"].strip()] == position]
+                if comments:
+                    batch = AcquireParseComment.parse_batch({**record["page"], "comments": comments})
+                    pending.append((batch, max(reply_end.get(cid, -1) for cid in batch.cid)))
+            elif with_replies and record["kind"] == "reply" and position >= reply_start[record["cid"]]:
+                reply_pages[record["cid"]].append(record["page"])
+            while pending and pending[0][1] <= position:
+                yield attach(pending.popleft()[0])
+        while pending:
+            yield attach(pending.popleft()[0])
@@ -0,0 +1,89 @@
+"""
+评论地点(ip_label)到省份名称的统一映射
+1. PROVINCES为GeoJSON(geojson.cn/DataV格式)中省级行政区的名称，PROVINCE_ALIASES把原始ip_label映射到这些名称
+2. 载入数据时只映射一次：原始标签先factorize，只对不同的标签查表，结果保存为categorical，
+   类别依次为PROVINCES和无法映射的原始标签(国外、IP未知等)，不丢失任何信息
+3. 按省份计数直接对categorical的编码做bincount
+4. 无法映射的标签不会出现在地图上，计数时打印出来并保存在结果的attrs['未匹配地点']中
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# GeoJSON中的省级行政区名称 -> 抖音ip_label使用的简称
+SHORT_NAMES = {
+    '北京市': '北京', '天津市': '天津', '河北省': '河北', '山西省': '山西', '内蒙古自治区': '内蒙古',
+    '辽宁省': '辽宁', '吉林省': '吉林', '黑龙江省': '黑龙江',
+    '上海市': '上海', '江苏省': '江苏', '浙江省': '浙江', '安徽省': '安徽', '福建省': '福建',
+    '江西省': '江西', '山东省': '山东',
+    '河南省': '河南', '湖北省': '湖北', '湖南省': '湖南', '广东省': '广东', '广西壮族自治区': '广西',
+    '海南省': '海南',
+    '重庆市': '重庆', '四川省': '四川', '贵州省': '贵州', '云南省': '云南', '西藏自治区': '西藏',
+    '陕西省': '陕西', '甘肃省': '甘肃', '青海省': '青海', '宁夏回族自治区': '宁夏', '新疆维吾尔自治区': '新疆',
+    '台湾省': '台湾', '香港特别行政区': '香港', '澳门特别行政区': '澳门',
+}
+
+PROVINCES = tuple(SHORT_NAMES)
+
+# 原始ip_label -> PROVINCES中的名称：全称、简称，以及带"中国"前缀的写法(如"中国台湾")
+PROVINCE_ALIASES: Dict[str, str] = {
+    alias: name
+    for name, short in SHORT_NAMES.items()
+    for alias in (name, short, f'中国{name}', f'中国{short}')
+}
+
+
+def to_province(label) -> Optional[str]:
+    """
+    把一个原始标签映射为省份名称，无法映射时返回None
+    """
+    if not isinstance(label, str):
+        return None
+    return PROVINCE_ALIASES.get(label.strip())
+
+
+def normalize_provinces(labels: pd.Series) -> pd.Series:
+    """
+    把原始评论地点转换为省份categorical
+    类别的前len(PROVINCES)个为PROVINCES，之后为无法映射的原始标签(去掉首尾空白)，缺失值保持缺失
+    :param labels: 原始ip_label
+    """
+    if isinstance(labels.dtype, pd.CategoricalDtype) and tuple(labels.cat.categories[:len(PROVINCES)]) == PROVINCES:
+        return labels
+    codes, uniques = pd.factorize(labels)
+    mapped = [to_province(label) for label in uniques]
+    unmapped = sorted({str(label).strip() for label, name in zip(uniques, mapped) if name is None})
+    categories = list(PROVINCES) + unmapped
+    positions = {name: i for i, name in enumerate(categories)}
+    # 末尾的-1对应factorize给缺失值的编码-1
+    lookup = np.array([positions[name if name is not None else str(label).strip()]
+                       for label, name in zip(uniques, mapped)] + [-1], dtype=np.int32)
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=categories),
+                     index=labels.index, name=labels.name)
+
+
+def count_provinces(provinces: pd.Series, weights: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    按省份计数
+    :param provinces: normalize_provinces的结果，或原始评论地点
+    :param weights: 每个标签的权重(如sql中已按标签聚合的数量)，为None时每行计1
+    :return: 评论数量大于0的省份及评论数量；无法映射的标签及其数量在attrs['未匹配地点']中
+    """
+    provinces = normalize_provinces(provinces)
+    codes = provinces.cat.codes.to_numpy()
+    valid = codes >= 0
+    categories = provinces.cat.categories
+    counts = np.bincount(codes[valid], weights=None if weights is None else np.asarray(weights)[valid],
+                         minlength=len(categories)).astype(np.int64)
+
+    mapped = counts[:len(PROVINCES)]
+    result = pd.DataFrame({'省份': np.array(PROVINCES, dtype=object)[mapped > 0], '评论数量': mapped[mapped > 0]})
+    unmapped = {label: int(count) for label, count in zip(categories[len(PROVINCES):], counts[len(PROVINCES):])
+                if count > 0}
+    if unmapped:
+        print(f"{sum(unmapped.values())}条评论的地点无法对应到地图上的省份: {unmapped}")
+    result.attrs['未匹配地点'] = unmapped
+    return result
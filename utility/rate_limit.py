@@ -0,0 +1,66 @@
+"""
+请求限速工具
+1. TokenBucket：令牌桶，多个协程共享同一个速率上限
+2. HostRateLimiter：按host限速，每个host一个令牌桶
+"""
+
+import asyncio
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+    令牌以rate个/秒的速度生成，最多积攒capacity个；每次请求消耗一个令牌，没有令牌时等待
+    多个worker共享同一个令牌桶时，总请求速率不超过rate，同时允许capacity个请求突发
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: 每秒生成的令牌数，小于等于0表示不限速
+        :param capacity: 令牌桶容量
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        获取一个令牌
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._updated = time.monotonic()
+                self._tokens = 1
+            self._tokens -= 1
+
+
+class HostRateLimiter:
+    """
+    按host限速
+    同一个host的请求频率不超过rate次/秒，不同host互不影响
+    """
+    def __init__(self, rate: float):
+        """
+        :param rate: 每个host每秒允许的请求数，小于等于0表示不限速
+        """
+        self.rate = rate
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def wait(self, url: str):
+        """
+        等待直到可以向url所在的host发送请求
+        :param url: 请求地址
+        """
+        host = urlparse(url).netloc
+        bucket = self._buckets.setdefault(host, TokenBucket(self.rate))
+        await bucket.acquire()
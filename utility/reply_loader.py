@@ -0,0 +1,103 @@
+"""
+回复的按需读取
+仪表盘展开某条评论时才读取它的回复，每次只取一页，不会预先载入全部回复
+1. csv：CsvStore为每个视频写了{aweme_id}_reply.idx索引，记录每条评论的回复在_reply.csv中的字节偏移和长度，
+   读取一条评论的回复只需一次字典查找和一次seek
+2. sqlite：douyin_reply表的reply_id(被回复的评论cid)建有索引
+"""
+import csv
+import io
+import os
+import sqlite3
+from contextlib import closing
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+REPLY_TABLE_NAME = "douyin_reply"
+REPLY_COLUMNS = ['CID', '回复的评论CID', '用户名', '回复内容', '回复点赞数']
+
+
+def reply_path(file_path: str) -> Optional[str]:
+    """
+    评论数据对应的回复数据位置，没有回复数据时返回None
+    :param file_path: load_data使用的评论数据路径
+    """
+    if file_path.endswith('.csv'):
+        path = file_path[:-len('.csv')] + '_reply.csv'
+        if os.path.exists(path) and os.path.exists(path[:-len('.csv')] + '.idx'):
+            return path
+    elif file_path.endswith('.db') and os.path.exists(file_path):
+        with closing(sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)) as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                            (REPLY_TABLE_NAME,)).fetchone():
+                return file_path
+    return None
+
+
+@lru_cache(maxsize=8)
+def load_csv_index(index_path: str, mtime: float) -> Dict[str, Tuple[int, int, int]]:
+    """
+    载入回复索引：评论cid -> (字节偏移, 字节数, 回复数)
+    同一条评论重复爬取时以最后一次为准；mtime只用于在爬虫追加索引后让缓存失效
+    """
+    index: Dict[str, Tuple[int, int, int]] = {}
+    with open(index_path, mode='r', encoding='utf-8') as file:
+        for line in file:
+            parts = line.rstrip('\n').split(',')
+            if len(parts) == 4:
+                index[parts[0]] = (int(parts[1]), int(parts[2]), int(parts[3]))
+    return index
+
+
+def load_csv_replies(path: str, cid: str, offset: int, limit: int) -> Tuple[List[Dict], int]:
+    """
+    从_reply.csv中读取一条评论的回复
+    """
+    index_path = path[:-len('.csv')] + '.idx'
+    entry = load_csv_index(index_path, os.path.getmtime(index_path)).get(cid)
+    if entry is None:
+        return [], 0
+    start, length, total = entry
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        data = file.read(length)
+    if len(data) < length:
+        # 索引已写入而回复还在爬虫的缓冲区中
+        return [], total
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+    return [dict(zip(REPLY_COLUMNS, row)) for row in rows[offset:offset + limit]], total
+
+
+def load_sqlite_replies(path: str, cid: str, offset: int, limit: int) -> Tuple[List[Dict], int]:
+    """
+    从douyin_reply表中读取一条评论的回复，按写入顺序分页
+    """
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM {REPLY_TABLE_NAME} WHERE reply_id = ?", (cid,)).fetchone()[0]
+        rows = conn.execute(f"""
+            SELECT cid, reply_id, user_name, reply_content, likes
+            FROM {REPLY_TABLE_NAME}
+            WHERE reply_id = ?
+            ORDER BY rowid
+            LIMIT ? OFFSET ?
+        """, (cid, limit, offset)).fetchall()
+    return [dict(zip(REPLY_COLUMNS, row)) for row in rows], total
+
+
+def load_replies(file_path: str, cid: str, offset: int = 0, limit: int = 10) -> Tuple[List[Dict], int]:
+    """
+    读取一条评论的一页回复
+    :param file_path: load_data使用的评论数据路径(csv或sqlite)
+    :param cid: 评论cid
+    :param offset: 跳过的回复数
+    :param limit: 最多读取的回复数
+    :return: (回复列表，每条回复的键见REPLY_COLUMNS；该评论的回复总数)
+    """
+    cid = str(cid)
+    path = reply_path(file_path)
+    if path is None:
+        return [], 0
+    if path.endswith('.db'):
+        return load_sqlite_replies(path, cid, offset, limit)
+    return load_csv_replies(path, cid, offset, limit)
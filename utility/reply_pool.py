@@ -0,0 +1,154 @@
+"""
+回复爬取工作池
+1. 固定数量的worker并发获取回复，所有worker共享一个令牌桶，总请求速率可配置
+2. 请求失败或触发反爬时按指数退避重试，不再每页固定随机等待
+3. 传入PageArchive时，每页原始回复都会写入归档
+"""
+
+import asyncio
+import json
+import random
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Union
+
+import requests
+
+from utility.data_acquire_parse import AcquireParseReply
+from utility.data_container import CommentBatch, CommentContainer, ReplyContainer
+from utility.page_archive import PageArchive
+from utility.rate_limit import TokenBucket
+
+
+class ReplyWorkerPool:
+    """
+    回复爬取工作池
+    用法：
+        async with ReplyWorkerPool(workers=8, rate=5) as pool:
+            await pool.attach_replies(aweme_id, comment_list)
+    """
+    def __init__(self, workers: int = 8, rate: float = 5.0, burst: Optional[float] = None,
+                 max_retries: int = 5, executor: Optional[Executor] = None):
+        """
+        :param workers: worker数量，即同时进行的回复请求上限
+        :param rate: 所有worker合计每秒允许的请求数
+        :param burst: 令牌桶容量，默认等于worker数量
+        :param max_retries: 单页最大重试次数
+        :param executor: 执行阻塞请求的线程池，默认使用事件循环的默认线程池
+        """
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst or workers)
+        self.max_retries = max_retries
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def start(self):
+        """
+        启动worker
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.workers * 2)
+        self._tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """
+        停止全部worker
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def worker(self):
+        """
+        从任务队列中取出评论id，获取它的全部回复
+        调用方已取消的任务(如调度器中另一个视频失败时)直接跳过；单条评论失败不会结束worker
+        """
+        while True:
+            aweme_id, cid, archive, future = await self._queue.get()
+            try:
+                if future.done():
+                    continue
+                try:
+                    replies = await self.fetch_replies(aweme_id, cid, archive)
+                except Exception as e:
+                    print(f"获取{cid}的回复失败: {e}")
+                    replies = ()
+                if not future.done():
+                    future.set_result(replies)
+            finally:
+                self._queue.task_done()
+
+    async def request(self, aweme_id: str, cid: str, cursor: int) -> Dict:
+        """
+        请求一页回复，失败时按指数退避重试
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                data = await loop.run_in_executor(self.executor, AcquireParseReply.fetch_page, aweme_id, cid, cursor)
+                if data is not None:
+                    return data
+            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+                print(f"请求异常: {e}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10) * random.uniform(0.5, 1.5))
+        raise RuntimeError(f"评论{cid}的回复在重试{self.max_retries}次后仍然失败")
+
+    async def fetch_replies(self, aweme_id: str, cid: str,
+                            archive: Optional[PageArchive] = None) -> List[ReplyContainer]:
+        """
+        获取一条评论的全部回复
+        :param aweme_id: 视频id
+        :param cid: 评论id
+        :param archive: 原始页面归档，为None时不归档
+        :return: 回复数据容器列表
+        """
+        reply_response_list: List[Dict] = []
+        cursor = 0
+        while True:
+            data = await self.request(aweme_id, cid, cursor)
+            if not data:
+                break
+            if archive is not None:
+                archive.append("reply", data, cursor, cid)
+            reply_response_list.append(data)
+            if not data.get('has_more', False):
+                break
+            cursor = data.get('cursor', cursor + 3)
+        return AcquireParseReply.parse_data(reply_response_list)
+
+    async def attach_replies(self, aweme_id: str, comment_list: Union[CommentBatch, List[CommentContainer]],
+                             archive: Optional[PageArchive] = None) -> int:
+        """
+        为一页评论获取回复，结果写入CommentBatch.comment_reply或comment.comment_reply
+        :param aweme_id: 视频id
+        :param comment_list: CommentBatch或评论数据容器列表
+        :param archive: 原始页面归档，为None时不归档
+        :return: 获取到的回复总数
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        batch = CommentBatch.of(comment_list)
+        indexes = [index for index, total in enumerate(batch.reply_comment_total) if total > 0]
+        futures = []
+        for index in indexes:
+            future = loop.create_future()
+            await self._queue.put((aweme_id, batch.cid[index], archive, future))
+            futures.append(future)
+
+        results: List[Sequence[ReplyContainer]] = await asyncio.gather(*futures)
+        for index, replies in zip(indexes, results):
+            batch.comment_reply[index] = replies
+            if batch is not comment_list:
+                comment_list[index].comment_reply = replies
+        return sum(len(replies) for replies in results)
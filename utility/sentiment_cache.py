@@ -0,0 +1,103 @@
+"""
+情感分析结果缓存
+以 sha1(模型id + 评论内容) 为键，把(情绪, 自信度)保存在sqlite中
+同一条评论在重启仪表盘、重新爬取后不需要再次推理；换模型或推理后端时模型id不同，缓存自然失效
+"""
+
+import hashlib
+import pathlib
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+
+class SentimentCache:
+    """
+    情感分析结果缓存
+    用法：
+        with SentimentCache(model_id) as cache:
+            results = cache.get_many(texts)   # 未命中的位置为None
+            cache.put_many(miss_texts, miss_results)
+    """
+    file_path = "data/cache/sentiment.db"
+    table_name = "sentiment"
+    # 单条sql中IN参数的数量上限，低于sqlite的默认限制
+    chunk_size = 500
+
+    def __init__(self, model_id: str, file_path: Optional[str] = None):
+        """
+        :param model_id: 模型标识，模型或推理后端不同的结果分开缓存
+        :param file_path: 缓存数据库路径
+        """
+        self.model_id = model_id
+        self.file_path = file_path or self.file_path
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        """
+        打开数据库，第一次使用时建表
+        """
+        if self.conn is not None:
+            return
+        pathlib.Path(self.file_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.file_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                key BLOB PRIMARY KEY,
+                label TEXT,
+                confidence REAL
+            ) WITHOUT ROWID
+        """)
+
+    def close(self):
+        """
+        关闭数据库
+        """
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def make_key(self, text: str) -> bytes:
+        """
+        缓存键：模型id与评论内容的sha1摘要
+        """
+        return hashlib.sha1(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[Tuple[str, float]]]:
+        """
+        批量查询
+        :param texts: 评论内容
+        :return: 与texts一一对应的(情绪, 自信度)，未命中为None
+        """
+        self.open()
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = list(set(keys[i:i + self.chunk_size]))
+            rows = self.conn.execute(
+                f"SELECT key, label, confidence FROM {self.table_name} WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update((key, (label, confidence)) for key, label, confidence in rows)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: Sequence[str], results: Sequence[Tuple[str, float]]):
+        """
+        批量写入，一个事务
+        :param texts: 评论内容
+        :param results: 与texts一一对应的(情绪, 自信度)
+        """
+        self.open()
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table_name} (key, label, confidence) VALUES (?, ?, ?)",
+                [(self.make_key(text), label, float(confidence)) for text, (label, confidence) in zip(texts, results)]
+            )
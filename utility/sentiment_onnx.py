@@ -0,0 +1,101 @@
+"""
+情感模型的ONNX Runtime推理后端
+1. 第一次使用时把PyTorch模型导出为ONNX(批大小和序列长度为动态维度)，可选再做int8动态量化
+2. 导出的文件缓存在data/cache/onnx下，之后直接加载
+3. 没有GPU的机器上用ONNX Runtime推理，int8量化进一步减少计算量和内存
+需要安装onnxruntime: pip install onnxruntime
+"""
+
+import os
+import pathlib
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+file_path = "data/cache/onnx"
+# BertForSequenceClassification.forward的参数顺序
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+# 每个会话的计算线程数，0表示由ONNX Runtime决定；多进程推理时由analyze_emo.init_worker设置
+intra_op_threads = 0
+
+
+def make_dir_path(model_name: str) -> str:
+    """
+    导出文件所在目录，每个模型一个目录
+    """
+    return f"{file_path}/{model_name.replace('/', '__')}"
+
+
+def export_model(quantize: bool = False) -> str:
+    """
+    导出ONNX模型，已导出时直接返回路径
+    先写临时文件再替换，导出中途失败不会留下损坏的缓存
+    :param quantize: 是否返回int8动态量化后的模型
+    :return: onnx文件路径
+    """
+    import torch
+    from utility.analyze_emo import load_model, model_name, tokenizer
+
+    dir_name = make_dir_path(model_name)
+    fp32_path = f"{dir_name}/model.onnx"
+    if not os.path.exists(fp32_path):
+        pathlib.Path(dir_name).mkdir(parents=True, exist_ok=True)
+        model = load_model()
+        model.eval()
+        dummy = tokenizer(["导出模型用的示例评论"], return_tensors="pt")
+        input_names = [name for name in INPUT_NAMES if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        tmp_path = f"{fp32_path}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(dummy[name].to(model.device) for name in input_names), tmp_path,
+                              input_names=input_names, output_names=["logits"],
+                              dynamic_axes=dynamic_axes, opset_version=14)
+        os.replace(tmp_path, fp32_path)
+        print(f"已导出ONNX模型: {fp32_path}")
+    if not quantize:
+        return fp32_path
+
+    int8_path = f"{dir_name}/model.int8.onnx"
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = f"{int8_path}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+        print(f"已生成int8量化模型: {int8_path}")
+    return int8_path
+
+
+@lru_cache(maxsize=2)
+def load_session(quantize: bool = False):
+    """
+    加载推理会话，每个进程每种模型只加载一次
+    """
+    if ort is None:
+        raise ImportError("ONNX推理后端需要安装onnxruntime: pip install onnxruntime")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    return ort.InferenceSession(export_model(quantize), options, providers=["CPUExecutionProvider"])
+
+
+def forward(inputs: Dict[str, np.ndarray], quantize: bool = False) -> List[List[float]]:
+    """
+    对一批已分词、已填充的输入推理
+    :param inputs: 分词器返回的numpy数组
+    :param quantize: 是否使用int8量化模型
+    :return: 每条评论的概率列表
+    """
+    session = load_session(quantize)
+    feed = {arg.name: inputs[arg.name].astype(np.int64) for arg in session.get_inputs()}
+    logits = session.run(["logits"], feed)[0]
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return (exp / exp.sum(axis=-1, keepdims=True)).tolist()
@@ -0,0 +1,94 @@
+"""
+SqliteStore数据的查询函数
+聚合直接在sqlite中用索引完成，只把聚合结果取到pandas中
+返回的DataFrame与data_prase中对应函数的结构相同，可以直接交给view中的图表函数
+"""
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from utility.province import count_provinces
+
+
+TABLE_NAME = "douyin_comment"
+# 与data_loader.load_data一致，忽略评论内容为空的记录
+VALID = "comment_content IS NOT NULL AND comment_content <> ''"
+# csv列名 -> 表中的列名
+COLUMNS = {
+    '用户名': 'user_name', '评论时间': 'comment_time', '评论地点': 'comment_ip', '评论内容': 'comment_content',
+    '评论点赞数': 'likes', '评论数量': 'reply_num', '情绪': 'emotion', '自信度': 'confidence',
+}
+
+
+def connect(db_path):
+    """
+    以只读方式打开数据库，不会与正在写入的爬虫争用锁
+    """
+    return closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True))
+
+
+def load_data(db_path, columns=None) -> pd.DataFrame:
+    """
+    载入评论表，列名与csv一致
+    爬取时做过情感分析的数据库还有情绪、自信度两列
+    :param columns: 只读取这些列(CID总是作为索引读取)，表中没有的列(如未做情感分析时的情绪)会被忽略；为None时读取整张表
+    """
+    with connect(db_path) as conn:
+        table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+        selected = [f"{column} AS {name}" for name, column in COLUMNS.items()
+                    if column in table_columns and (columns is None or name in columns)]
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(['cid AS CID'] + selected)}
+            FROM {TABLE_NAME}
+            WHERE {VALID}
+        """, conn, index_col='CID')
+
+
+def get_time_comments(db_path) -> pd.DataFrame:
+    """
+    按小时统计评论数量，没有评论的小时补0
+    """
+    with connect(db_path) as conn:
+        hourly = pd.read_sql_query(f"""
+            SELECT strftime('%Y-%m-%d %H:00:00', comment_time) AS 评论时间, COUNT(*) AS 评论数量
+            FROM {TABLE_NAME}
+            WHERE comment_time IS NOT NULL AND {VALID}
+            GROUP BY 1
+            ORDER BY 1
+        """, conn, parse_dates=['评论时间'])
+    if not hourly.empty:
+        hours = pd.date_range(hourly['评论时间'].min(), hourly['评论时间'].max(), freq='h', name='评论时间')
+        hourly = hourly.set_index('评论时间').reindex(hours, fill_value=0).reset_index()
+    hourly['日期'] = hourly['评论时间'].dt.date
+    hourly['时间'] = hourly['评论时间'].dt.time
+    return hourly
+
+
+def get_local_comments(db_path) -> pd.DataFrame:
+    """
+    按评论地点统计评论数量
+    """
+    with connect(db_path) as conn:
+        local_comments = pd.read_sql_query(f"""
+            SELECT comment_ip AS 省份, COUNT(*) AS 评论数量
+            FROM {TABLE_NAME}
+            WHERE comment_ip IS NOT NULL AND {VALID}
+            GROUP BY comment_ip
+        """, conn)
+    # 每个原始地点一行，按评论数量加权映射到省份
+    return count_provinces(local_comments['省份'], weights=local_comments['评论数量'])
+
+
+def get_hot_comments(db_path, limit=10) -> pd.DataFrame:
+    """
+    点赞数最高的评论
+    """
+    with connect(db_path) as conn:
+        return pd.read_sql_query(f"""
+            SELECT user_name AS 用户名, comment_content AS 评论内容, likes AS 评论点赞数
+            FROM {TABLE_NAME}
+            WHERE {VALID}
+            ORDER BY likes DESC
+            LIMIT ?
+        """, conn, params=(limit,))
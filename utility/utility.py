@@ -4,32 +4,54 @@
 
 
 
-from utility.data_container import CommentContainer, ReplyContainer
+from utility.data_container import CommentBatch, CommentContainer, ReplyContainer
 
-from asyn_db import AsyncMysqlDB
+from utility.asyn_db import AsyncMysqlDB
 
 from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
 
+import aiomysql
 
-async def insert_comment(db: AsyncMysqlDB, table_name:str,comment: CommentContainer) -> int:
+
+def to_datetime(comment_time: str) -> datetime:
     """
-    插入数据
-    :param db:
-    :param comment:
-    :return:
+    将评论时间转换为datetime格式
+    兼容时间戳和 "%Y-%m-%d %H:%M:%S" 格式的字符串
+    """
+    if str(comment_time).isdigit():
+        return datetime.fromtimestamp(int(comment_time))
+    return datetime.strptime(comment_time, "%Y-%m-%d %H:%M:%S")
+
+
+def comment_to_item(comment: CommentContainer, with_sentiment: bool = False) -> Dict[str, Any]:
+    """
+    将评论容器转换为数据库记录
+    :param with_sentiment: 是否包含情感分析结果(emotion、confidence)
     """
-    # 将时间戳转换为datetime格式
-    comment_time = datetime.fromtimestamp(int(comment.comment_time))
-    
     item = {
         "cid": comment.cid,
         "user_name": comment.user_name,
-        "comment_time": comment_time,  # 使用转换后的datetime
+        "comment_time": to_datetime(comment.comment_time),
         "comment_ip": comment.comment_ip,
         "comment_content": comment.comment_content,
         "reply_num": len(comment.comment_reply),
         "likes": comment.likes
     }
+    if with_sentiment:
+        item["emotion"] = comment.emotion
+        item["confidence"] = comment.confidence
+    return item
+
+
+async def insert_comment(db: AsyncMysqlDB, table_name:str,comment: CommentContainer) -> int:
+    """
+    插入数据
+    :param db:
+    :param comment:
+    :return:
+    """
+    item = comment_to_item(comment)
     print(f"准备插入数据: {item}")
     result = await db.item_to_table(table_name, item)
     print(f"插入结果: {result}")
@@ -43,21 +65,58 @@ async def update_comment(db: AsyncMysqlDB, table_name:str,comment: CommentContai
     :param comment:
     :return:
     """
-    # 将时间戳转换为datetime格式
-    comment_time = datetime.fromtimestamp(int(comment.comment_time))
-    
-    item = {
-        "user_name": comment.user_name,
-        "comment_time": comment_time,  # 使用转换后的datetime
-        "comment_ip": comment.comment_ip,
-        "comment_content": comment.comment_content,
-        "reply_num": len(comment.comment_reply),
-        "likes": comment.likes
-    }
+    item = comment_to_item(comment)
+    item.pop("cid")
     print(f"Updating item: {item}")
     return await db.update_table(table_name, item, "cid", comment.cid)
 
 
+async def upsert_comments(db: AsyncMysqlDB, table_name: str, comments: Iterable[CommentContainer],
+                          cur: Optional[aiomysql.Cursor] = None) -> int:
+    """
+    批量插入或更新评论，一批评论一次往返、一个事务
+    这批评论做过情感分析时一并写入emotion、confidence，否则不更新这两列
+    :param db:
+    :param table_name:
+    :param comments:
+    :param cur: db.transaction()返回的游标，为None时单独开启一个事务
+    :return: 受影响的行数
+    """
+    comments = CommentBatch.of(comments)
+    with_sentiment = comments.has_sentiment()
+    items = [comment_to_item(comment, with_sentiment) for comment in comments]
+    return await db.upsert_many(table_name, items, [field for field in items[0] if field != "cid"] if items else None,
+                                cur=cur)
+
+
+def reply_to_item(reply: ReplyContainer, parent_cid: str = "") -> Dict[str, Any]:
+    """
+    将回复容器转换为数据库记录
+    :param parent_cid: 被回复的评论cid，为空时使用reply.reply_id
+    """
+    return {
+        "cid": reply.cid,
+        "reply_id": parent_cid or reply.reply_id,
+        "user_name": reply.user_name,
+        "reply_content": reply.reply_content,
+        "likes": reply.likes
+    }
+
+
+async def upsert_replies(db: AsyncMysqlDB, table_name: str, comments: CommentBatch,
+                         cur: Optional[aiomysql.Cursor] = None) -> int:
+    """
+    批量插入或更新一批评论的全部回复
+    :param db:
+    :param table_name:
+    :param comments:
+    :param cur: db.transaction()返回的游标，为None时单独开启一个事务
+    :return: 受影响的行数
+    """
+    items = [reply_to_item(reply, cid) for cid, replies in zip(comments.cid, comments.comment_reply) for reply in replies]
+    return await db.upsert_many(table_name, items, ["reply_id", "user_name", "reply_content", "likes"], cur=cur)
+
+
 async def query_comment_by_cid(db: AsyncMysqlDB, table_name:str, cid: str) -> CommentContainer:
     """
     查询数据
@@ -81,13 +140,7 @@ async def insert_reply(db: AsyncMysqlDB, table_name: str, reply: ReplyContainer)
     :param reply: 回复数据容器
     :return: 插入的行ID
     """
-    item = {
-        'cid': reply.cid,
-        'reply_id': reply.reply_id,
-        'user_name': reply.user_name,
-        'reply_content': reply.reply_content,
-        'likes': reply.likes
-    }
+    item = reply_to_item(reply)
     print(f"Inserting reply: {item}")
     return await db.item_to_table(table_name, item)
 
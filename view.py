@@ -4,12 +4,12 @@
 
 ### 导入依赖库
 import plotly.express as px
-import requests
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
 # 导入自定义配置
 from utility.config import config
+from utility.geojson_loader import load_geojson
 
 
 def create_time_figure(df, selected_date):
@@ -120,6 +120,29 @@ def create_emotion_pie(df):
     )
     return fig
 
+def create_placeholder_figure(text):
+    """
+    后台计算未完成时的占位图
+    输入：提示文字
+    输出：只有居中文字的空白图
+    """
+    fig = go.Figure()
+    fig.add_annotation(
+        text=text,
+        x=0.5, y=0.5,
+        xref='paper', yref='paper',
+        showarrow=False,
+        font=dict(size=16, color='#7f8c8d')
+    )
+    fig.update_layout(
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=40, b=30, l=20, r=20)
+    )
+    return fig
+
 def create_emotion_bar(df):
     fig = px.bar(
         df,
@@ -150,12 +173,13 @@ def create_emotion_bar(df):
     return fig
 
 
-def create_local_figure(df):
+def create_local_figure(df, tolerance=None):
     """
     获取地理分布图
+    :param tolerance: 省份边界的简化容差(度)，为None时使用config.GEOJSON_TOLERANCE，为0时不简化
     """
-    # 获取GeoJSON数据
-    geojson_data = requests.get(config.GEOJSON_URL).json()
+    # 获取GeoJSON数据，每个进程只读取一次
+    geojson_data = load_geojson(config.GEOJSON_TOLERANCE if tolerance is None else tolerance)
 
     # 获取所有省份列表
     provinces_in_geojson = [f['properties']['name'] for f in geojson_data['features']]